@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест полного пути обработки TelegramMonitor без сети.
+
+Сообщения синтетического корпуса (или записанного потока) передаются с
+заданной частотой в настоящие обработчики бота: очередь входящих, поиск
+ключевых слов, сохранение курсоров, журнал и архив, рендеринг и очередь
+отправки. Вместо Telegram - benchmarks/fake_telegram.py: отправка с
+задержкой и случайными FloodWait.
+
+    python benchmarks/bench_load.py                          # 50, 100, 200, 400 сообщ./с по 20 с
+    python benchmarks/bench_load.py --rates 100 500 1000 --duration 30 --groups 300
+    python benchmarks/bench_load.py --stream messages.jsonl  # записанный поток
+    python benchmarks/bench_load.py --send-latency 200 --flood-rate 0.01
+
+Настройки бота берутся из окружения, как при обычном запуске
+(INGEST_WORKERS, MATCH_WORKERS, ROUTES, DIGEST_WINDOW и т.д.).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus, load_production_keywords  # noqa: E402
+
+# Бот читает настройки из окружения при импорте config
+os.environ.setdefault('KEYWORDS', ','.join(load_production_keywords()))
+# Корпус собран из шаблонов: с подавлением дубликатов почти все предложения
+# отсеялись бы и отправка не получила бы нагрузки
+os.environ.setdefault('DEDUP_MODE', 'off')
+# Клиенты Telethon создаются, но не подключаются
+os.environ.setdefault('API_ID', '1')
+os.environ.setdefault('API_HASH', 'load-test')
+
+from bot import TelegramMonitor, morph  # noqa: E402
+from config import TARGET_GROUP, CURSOR_FLUSH_INTERVAL  # noqa: E402
+from entity_cache import CachedEntity  # noqa: E402
+from benchmarks.fake_telegram import FakeUserClient, FakeBotClient  # noqa: E402
+from benchmarks.bench_matching import percentile  # noqa: E402
+
+
+def load_stream(path):
+    """Тексты записанного потока: JSON Lines с полем text или по сообщению в строке"""
+    texts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('text') or ''
+            if line:
+                texts.append(line)
+    return texts
+
+
+def track_delivery(sender, latencies):
+    """Записывает задержку от времени сообщения до доставки каждого уведомления, мс"""
+    send = sender.send
+
+    def tracked_send(entity, text, priority=sender.PRIORITY_LIVE, message_date=None, **kwargs):
+        future = send(entity, text, priority, message_date, **kwargs)
+        if message_date is not None:
+            def on_sent(done):
+                if not done.cancelled() and done.result() is not None:
+                    latencies.append((time.time() - message_date.timestamp()) * 1000)
+            future.add_done_callback(on_sent)
+        return future
+
+    sender.send = tracked_send
+
+
+async def run_load(rate, texts, args):
+    """Один прогон с частотой rate сообщений в секунду; возвращает строку отчета"""
+    data_dir = tempfile.mkdtemp(prefix='bench_load_')
+    monitor = TelegramMonitor(data_dir)
+    user_client = FakeUserClient()
+    bot_client = FakeBotClient(args.send_latency / 1000, args.send_jitter / 1000,
+                               args.flood_rate, args.flood_seconds)
+    for shard in monitor.shards:
+        shard.client = user_client
+    monitor.user_client = user_client
+    monitor.bot_client = bot_client
+    sender = monitor.notification_sender
+    sender.client = bot_client
+    if args.send_rate:
+        sender.rate = args.send_rate / 60
+
+    monitor.target_entity = await bot_client.get_entity(TARGET_GROUP)
+    await monitor.resolve_routes()
+    chats = []
+    for i in range(args.groups):
+        entity = CachedEntity(1000 + i, i, 'channel', f"Группа {i}", f"load_group_{i}")
+        monitor.add_group(f"t.me/load_group_{i}", entity)
+        chats.append(entity.peer_id)
+    stream = [(chats[i % len(chats)], text) for i, text in enumerate(texts)]
+
+    processed = 0
+    handler = monitor.ingest_queue.handler
+
+    async def counted(message):
+        nonlocal processed
+        try:
+            await handler(message)
+        finally:
+            processed += 1
+
+    monitor.ingest_queue.handler = counted
+    latencies = []
+    track_delivery(sender, latencies)
+
+    monitor.message_time_manager.start_flusher(CURSOR_FLUSH_INTERVAL)
+    if monitor.matching_pool:
+        monitor.matching_pool.start()
+    await monitor.setup_event_handlers()
+
+    # Глубина очереди отправки раз в полсекунды
+    send_pending = [0]
+
+    async def sample_pending():
+        while True:
+            send_pending.append(sender.pending)
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.get_running_loop().create_task(sample_pending())
+    window_started = time.perf_counter()
+    offered = await user_client.replay(stream, rate, args.duration)
+    window = time.perf_counter() - window_started
+    window_processed = processed
+    window_sent = sender.sent_count
+    sampler.cancel()
+    send_pending.append(sender.pending)
+
+    # Дорабатываем накопленное, чтобы задержки учитывали и хвост очередей
+    drain_started = time.perf_counter()
+    await monitor.ingest_queue.stop(args.drain)
+    if monitor.digest is not None:
+        monitor.digest.flush()
+    await sender.stop(args.drain)
+    drain_s = time.perf_counter() - drain_started
+
+    if monitor.matching_pool:
+        monitor.matching_pool.shutdown()
+    monitor.outbox.close()
+    if monitor.offer_archive is not None:
+        monitor.offer_archive.close()
+    await monitor.message_time_manager.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    latencies.sort()
+    ingest_stats = monitor.ingest_queue.stats()
+    processed_per_sec = window_processed / window
+    return {
+        'rate': rate,
+        'window_s': round(window, 1),
+        'offered': offered,
+        'processed_per_sec': round(processed_per_sec, 1),
+        'sent_per_sec': round(window_sent / window, 1),
+        # Отставание от заданной частоты: очередь входящих и необработанные обновления Telethon
+        'backlog_growth_per_sec': round(max(0.0, rate - processed_per_sec), 1),
+        'ingest_max_depth': ingest_stats['max_depth'],
+        'ingest_dropped': ingest_stats['dropped'],
+        'send_growth_per_sec': round((send_pending[-1] - send_pending[0]) / window, 1),
+        'send_max_pending': max(send_pending),
+        'notifications': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'flood_waits': bot_client.flood_waits,
+        'drain_s': round(drain_s, 1),
+    }
+
+
+def keeps_up(row):
+    """Бот успевает: обработано не меньше 95% заданной частоты.
+
+    При INGEST_QUEUE_POLICY=block заполненная очередь тормозит подачу
+    сообщений (как Telethon копит обновления), поэтому сравнение идет с
+    заданной частотой, а не с поданным числом сообщений.
+    """
+    return row['processed_per_sec'] >= 0.95 * row['rate']
+
+
+def print_report(results):
+    header = (f"{'сообщ./с':>9}{'обраб./с':>10}{'отпр./с':>9}{'отставание':>11}{'макс вход.':>11}"
+              f"{'рост отпр.':>11}{'макс отпр.':>11}{'p50 мс':>9}{'p99 мс':>9}{'FloodWait':>10}")
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        mark = '' if keeps_up(row) else '  ⚠️ не успевает'
+        print(f"{row['rate']:>9g}{row['processed_per_sec']:>10}{row['sent_per_sec']:>9}"
+              f"{row['backlog_growth_per_sec']:>11}{row['ingest_max_depth']:>11}"
+              f"{row['send_growth_per_sec']:>11}{row['send_max_pending']:>11}"
+              f"{row['p50_ms']:>9}{row['p99_ms']:>9}{row['flood_waits']:>10}{mark}")
+
+    limit = next((row for row in results if not keeps_up(row)), None)
+    if limit is None:
+        print(f"✅ Все частоты выдержаны (до {results[-1]['rate']:g} сообщ./с)")
+    else:
+        below = [row['rate'] for row in results if row['rate'] < limit['rate'] and keeps_up(row)]
+        print(f"📉 Предел пропускной способности: {f'между {below[-1]:g} и ' if below else 'ниже '}"
+              f"{limit['rate']:g} сообщ./с")
+    if any(row['send_growth_per_sec'] > 0 for row in results):
+        print("💡 Очередь отправки растет: уведомлений больше, чем чат успевает принять "
+              "(SEND_RATE_PER_MINUTE и задержка отправки)")
+
+
+async def run_all(texts, args):
+    results = []
+    for rate in sorted(args.rates):
+        print(f"🚀 {rate:g} сообщ./с, {args.duration:g} с, групп: {args.groups}")
+        results.append(await run_load(rate, texts, args))
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест обработки сообщений')
+    parser.add_argument('--rates', type=float, nargs='+', default=[50, 100, 200, 400],
+                        help='частоты входящих сообщений, сообщ./с')
+    parser.add_argument('--duration', type=float, default=20, help='длительность прогона каждой частоты, с')
+    parser.add_argument('--groups', type=int, default=100, help='число групп, по которым распределяется поток')
+    parser.add_argument('--messages', type=int, default=5000, help='размер синтетического корпуса')
+    parser.add_argument('--offer-ratio', type=float, default=0.4, help='доля предложений в корпусе')
+    parser.add_argument('--stream', help='записанный поток: JSON Lines с полем text или по сообщению в строке')
+    parser.add_argument('--send-latency', type=float, default=50, help='задержка отправки уведомления, мс')
+    parser.add_argument('--send-jitter', type=float, default=20, help='разброс задержки отправки, мс')
+    parser.add_argument('--flood-rate', type=float, default=0.0, help='вероятность FloodWait на отправку')
+    parser.add_argument('--flood-seconds', type=int, default=5, help='длительность FloodWait, с')
+    parser.add_argument('--send-rate', type=float,
+                        help='уведомлений в минуту на чат (по умолчанию: SEND_RATE_PER_MINUTE)')
+    parser.add_argument('--drain', type=float, default=60, help='сколько ждать разбора очередей после прогона, с')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    texts = load_stream(args.stream) if args.stream else generate_corpus(args.messages, args.offer_ratio)
+    if not texts:
+        print("❌ Поток сообщений пуст")
+        sys.exit(1)
+    print(f"📚 Поток: {len(texts)} сообщений")
+
+    # Словари грузятся один раз, до прогонов
+    morph.wait()
+    results = asyncio.run(run_all(texts, args))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки горячего пути поиска ключевых слов.
+
+Работает без сети: использует синтетический корпус из benchmarks/corpus.py
+и боевой список ключевых слов из .env.example.
+
+    python benchmarks/bench_matching.py                  # прогон и сравнение с baseline.json
+    python benchmarks/bench_matching.py --save-baseline  # обновить baseline.json
+    python benchmarks/bench_matching.py --check          # код возврата 1 при регрессии
+
+Каждый бенчмарк прогоняется --repeat раз, в отчет и baseline идет прогон
+с медианной скоростью: одиночный прогон на общей машине гуляет на десятки
+процентов, и порог --check срабатывал бы от шума.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus, load_production_keywords  # noqa: E402
+
+# Бот читает ключевые слова из окружения при импорте config
+os.environ.setdefault('KEYWORDS', ','.join(load_production_keywords()))
+
+from bot import TelegramMonitor, morph  # noqa: E402
+from config import LEMMA_CACHE_SIZE  # noqa: E402
+from keyword_index import KeywordIndex  # noqa: E402
+from lemma_cache import LemmaCache  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def make_monitor(keywords):
+    """TelegramMonitor без Telegram-клиентов: только то, что нужно для поиска"""
+    monitor = TelegramMonitor.__new__(TelegramMonitor)
+    monitor.keyword_index = KeywordIndex(keywords)
+    # Словари грузятся один раз, до замеров
+    morph.wait()
+    monitor.lemma_cache = LemmaCache(morph, LEMMA_CACHE_SIZE)
+    return monitor
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_timed(func, inputs):
+    """Вызывает func для каждого входа и возвращает задержки в микросекундах"""
+    latencies = []
+    perf = time.perf_counter_ns
+    for item in inputs:
+        start = perf()
+        func(item)
+        latencies.append((perf() - start) / 1000)
+    return latencies
+
+
+def run_peak_memory(func, inputs):
+    """Пиковый прирост памяти (КиБ) за один проход"""
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def build_benchmarks(corpus, keywords):
+    """Набор бенчмарков: имя -> фабрика (функция, входные данные)"""
+
+    def find_keywords_cold():
+        # Новый кэш лемм: каждое слово разбирается pymorphy3 впервые
+        return make_monitor(keywords).find_keywords, corpus
+
+    def find_keywords_warm():
+        monitor = make_monitor(keywords)
+        for text in corpus:
+            monitor.find_keywords(text)
+        return monitor.find_keywords, corpus
+
+    def find_keywords_batch_cold():
+        # Пачки по 100 сообщений, как при дочитывании истории; calls/s — пачки в секунду
+        batches = [corpus[i:i + 100] for i in range(0, len(corpus), 100)]
+        return make_monitor(keywords).find_keywords_batch, batches
+
+    def expand_keyword():
+        monitor = make_monitor(keywords)
+        return monitor.expand_keyword, keywords * max(1, len(corpus) // max(1, len(keywords)))
+
+    def extract_telegram_username():
+        return make_monitor(keywords).extract_telegram_username, corpus
+
+    def keyword_index_compile():
+        return KeywordIndex, [keywords] * 20
+
+    return {
+        'find_keywords_cold': find_keywords_cold,
+        'find_keywords_warm': find_keywords_warm,
+        'find_keywords_batch_cold': find_keywords_batch_cold,
+        'expand_keyword': expand_keyword,
+        'extract_telegram_username': extract_telegram_username,
+        'keyword_index_compile': keyword_index_compile,
+    }
+
+
+def run_benchmarks(corpus, keywords, only=None, repeat=1):
+    results = {}
+    for name, factory in build_benchmarks(corpus, keywords).items():
+        if only and name not in only:
+            continue
+        runs = []
+        for _ in range(max(1, repeat)):
+            func, inputs = factory()
+            runs.append(run_timed(func, inputs))
+        # Прогон с медианной суммарной длительностью
+        runs.sort(key=sum)
+        latencies = runs[len(runs) // 2]
+        total_s = sum(latencies) / 1e6
+
+        func, inputs = factory()
+        peak_kib = run_peak_memory(func, inputs)
+
+        latencies.sort()
+        results[name] = {
+            'calls': len(latencies),
+            'per_sec': round(len(latencies) / total_s, 1) if total_s else 0.0,
+            'p50_us': round(percentile(latencies, 50), 2),
+            'p95_us': round(percentile(latencies, 95), 2),
+            'p99_us': round(percentile(latencies, 99), 2),
+            'peak_kib': round(peak_kib, 1),
+        }
+    return results
+
+
+def print_report(results, baseline, threshold):
+    """Печатает таблицу и возвращает список регрессий относительно baseline"""
+    regressions = []
+    header = f"{'benchmark':<28}{'calls/s':>12}{'p50 мкс':>10}{'p95 мкс':>10}{'p99 мкс':>10}{'пик КиБ':>10}  vs baseline"
+    print(header)
+    print('-' * len(header))
+    for name, row in results.items():
+        delta = ''
+        base = (baseline or {}).get('results', {}).get(name)
+        if base and base.get('per_sec'):
+            change = row['per_sec'] / base['per_sec'] - 1
+            delta = f"{change:+.0%}"
+            if change < -threshold:
+                delta += ' ⚠️'
+                regressions.append(name)
+        print(f"{name:<28}{row['per_sec']:>12}{row['p50_us']:>10}{row['p95_us']:>10}"
+              f"{row['p99_us']:>10}{row['peak_kib']:>10}  {delta}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки поиска ключевых слов')
+    parser.add_argument('--messages', type=int, default=2000, help='размер корпуса')
+    parser.add_argument('--only', nargs='*', help='запустить только указанные бенчмарки')
+    parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты в baseline.json')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимое падение calls/s относительно baseline (доля)')
+    parser.add_argument('--check', action='store_true', help='завершиться с кодом 1 при регрессии')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='прогонов каждого бенчмарка, берется медианный')
+    args = parser.parse_args()
+
+    keywords = load_production_keywords()
+    corpus = generate_corpus(args.messages)
+    print(f"📚 Корпус: {len(corpus)} сообщений, {len(keywords)} ключевых слов")
+
+    results = run_benchmarks(corpus, keywords, args.only, args.repeat)
+
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = print_report(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        saved = results
+        if args.only and baseline:
+            # Прогон с --only обновляет только свои записи, остальные сохраняются
+            saved = {**baseline.get('results', {}), **results}
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'messages': len(corpus),
+                'results': saved,
+            }, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"💾 Baseline сохранен: {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if regressions:
+        print(f"⚠️ Регрессия больше {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Синтетический корпус сообщений из музыкальных чатов для бенчмарков.
+
+Корпус детерминирован (фиксированный seed), поэтому результаты разных
+запусков сравнимы между собой.
+"""
+
+import os
+import random
+from typing import List
+
+ENV_EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.example')
+
+OFFER_TEMPLATES = [
+    "Ищем {musician} на {event} {date}, {city}. Гонорар {fee} ₽. Пишите {contact}",
+    "Срочно! Нужен {musician} на {event}, {date}. Оплата {fee}, подробности в лс {contact}",
+    "Добрый день! Требуется {musician} для {event}. {city}, {date}. Репертуар: {genre}. {contact}",
+    "Кто свободен {date}? Нужен {musician} и {musician2} на {event}, {fee} ₽ каждому",
+    "В ресторан в {city} ищем {musician} на постоянную работу, живая музыка по пятницам. {genre}. Звоните {phone}",
+    "Нужна {musician_f} на {event}, {date}, {city}. Классика и эстрада, 2 отделения по 45 минут. {contact}",
+    "Собираем кавер-бэнд для {event}: нужны {musician} и {musician2}. Репетиции в {city}. {contact}",
+    "Ищу аккомпаниатора: {musician} для детского хора, занятия для детей 7-12 лет. {contact}",
+    "Продам {instrument} в отличном состоянии, {fee} ₽, самовывоз {city}",
+    "Концерт {date} в {city}, нужен {musician} на замену, программа готова, {fee} ₽. {contact}",
+]
+
+CHATTER_TEMPLATES = [
+    "Всем привет! Подскажите, где в {city} можно снять репетиционную базу недорого?",
+    "Спасибо всем, кто пришел вчера, было здорово!",
+    "Кто знает хорошего мастера по ремонту усилителей?",
+    "Напоминаю правила чата: реклама только по пятницам",
+    "Ребята, а кто-нибудь ездил на фестиваль в {city} в прошлом году?",
+    "Отличная новость, площадку продлили до конца месяца",
+    "Голосуем за дату следующей встречи: {date} или через неделю?",
+    "Ок, договорились, созвонимся завтра",
+]
+
+MUSICIANS = [
+    'скрипача', 'альтиста', 'виолончелиста', 'контрабасиста', 'арфистку', 'флейтиста', 'саксофониста',
+    'трубача', 'тромбониста', 'кларнетиста', 'пианиста', 'гитариста', 'бас-гитариста', 'баяниста',
+    'аккордеониста', 'вокалиста', 'вокалистку', 'певицу', 'диджея', 'DJ', 'барабанщика', 'ударника',
+    'струнный квартет', 'джазовое трио', 'дуэт', 'солиста', 'хор',
+]
+MUSICIANS_F = ['скрипачка', 'пианистка', 'вокалистка', 'арфистка', 'саксофонистка', 'певица', 'флейтистка']
+INSTRUMENTS = ['скрипку', 'гитару Fender', 'цифровое пианино', 'саксофон альт', 'комбоусилитель', 'ханг']
+EVENTS = [
+    'свадьбу', 'корпоратив', 'юбилей', 'выпускной', 'банкет', 'фуршет', 'открытие ресторана',
+    'день рождения', 'презентацию', 'новогодний вечер', 'детский праздник', 'вечеринку',
+]
+GENRES = ['джаз, поп, рок', 'классика', 'эстрада и хиты 90-х', 'танцевальная музыка', 'фоновая музыка', 'jazz, pop']
+CITIES = ['Москве', 'Санкт-Петербурге', 'Казани', 'Подмосковье', 'Сочи', 'Екатеринбурге', 'Новосибирске']
+DATES = ['12 июня', 'в эту субботу', 'завтра', '31 декабря', 'на следующей неделе', '5 марта с 19:00']
+CONTACTS = ['@event_agency', '@ivan_music', '@booking_spb', 'в личку', '@maria_k', 'по телефону']
+
+
+def load_production_keywords() -> List[str]:
+    """Список ключевых слов из .env.example (боевой список)"""
+    with open(ENV_EXAMPLE, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('KEYWORDS='):
+                return [kw.strip() for kw in line.split('=', 1)[1].split(',') if kw.strip()]
+    return []
+
+
+def generate_corpus(size: int = 2000, offer_ratio: float = 0.4, seed: int = 42) -> List[str]:
+    """Генерирует size сообщений, из них примерно offer_ratio — предложения работы"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(size):
+        templates = OFFER_TEMPLATES if rng.random() < offer_ratio else CHATTER_TEMPLATES
+        template = rng.choice(templates)
+        messages.append(template.format(
+            musician=rng.choice(MUSICIANS),
+            musician2=rng.choice(MUSICIANS),
+            musician_f=rng.choice(MUSICIANS_F),
+            instrument=rng.choice(INSTRUMENTS),
+            event=rng.choice(EVENTS),
+            genre=rng.choice(GENRES),
+            city=rng.choice(CITIES),
+            date=rng.choice(DATES),
+            fee=rng.choice([5000, 8000, 10000, 15000, 25000]),
+            contact=rng.choice(CONTACTS),
+            phone=f"+7 9{rng.randint(10, 99)} {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+        ))
+    return messages
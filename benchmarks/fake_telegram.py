@@ -0,0 +1,141 @@
+"""
+Заменители TelegramClient для нагрузочных тестов без сети.
+
+FakeUserClient передает сообщения в обработчики событий бота с заданной
+частотой, FakeBotClient принимает уведомления с задержкой отправки и
+случайными FloodWait, как Bot API.
+"""
+
+import asyncio
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
+
+from telethon import errors
+
+from entity_cache import CachedEntity
+
+
+class FakeSender:
+    """Автор сообщения с полями, которые читает бот"""
+
+    def __init__(self, sender_id: int):
+        self.id = sender_id
+        self.username = f"user{sender_id}"
+        self.first_name = "Музыкант"
+        self.last_name = str(sender_id)
+
+
+class FakeMessage:
+    """Новое сообщение группы: одновременно событие NewMessage и его message"""
+
+    def __init__(self, message_id: int, text: str, chat_id: int, sender_id: int):
+        self.id = message_id
+        self.text = text
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        # Время с точностью до микросекунд, чтобы задержки были точнее секунд Telegram
+        self.date = datetime.now(timezone.utc)
+        self.message = self
+
+    async def get_sender(self):
+        return FakeSender(self.sender_id)
+
+    async def get_chat(self):
+        return None
+
+
+class FakeUserClient:
+    """Userbot: хранит обработчики событий и воспроизводит поток сообщений"""
+
+    def __init__(self):
+        self.handlers = []
+        self.delivered = 0
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if cb is not callback]
+
+    async def disconnect(self):
+        pass
+
+    async def replay(self, stream: Iterable[Tuple[int, str]], rate: float, duration: float,
+                     senders: int = 500, seed: int = 42) -> int:
+        """Передает сообщения (id чата, текст) в обработчики с частотой rate в секунду.
+
+        Сообщения отправляются пачками раз в 10 мс, чтобы частота держалась
+        и при медленных обработчиках; поток повторяется по кругу, пока не
+        пройдет duration секунд. Возвращает число переданных сообщений.
+        """
+        rng = random.Random(seed)
+        stream = list(stream)
+        message_ids = {}
+        started = time.perf_counter()
+        sent = 0
+        index = 0
+        while True:
+            elapsed = time.perf_counter() - started
+            if elapsed >= duration:
+                break
+            due = int(elapsed * rate)
+            while sent < due:
+                chat_id, text = stream[index % len(stream)]
+                index += 1
+                message_ids[chat_id] = message_ids.get(chat_id, 0) + 1
+                message = FakeMessage(message_ids[chat_id], text, chat_id, rng.randint(1, senders))
+                for callback, _ in self.handlers:
+                    await callback(message)
+                sent += 1
+                # Telethon разбирает обновления в своей задаче: обработчики очереди работают параллельно
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.01)
+        self.delivered += sent
+        return sent
+
+
+class FakeSentMessage:
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+
+class FakeBotClient:
+    """Bot API: отправка с задержкой latency ± jitter секунд и FloodWait с вероятностью flood_rate"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, flood_rate: float = 0.0,
+                 flood_seconds: int = 5, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.rng = random.Random(seed)
+        self.sent: List[Tuple[float, int]] = []  # (время отправки, id чата)
+        self.edited = 0
+        self.flood_waits = 0
+
+    async def _call(self):
+        await asyncio.sleep(max(0.0, self.rng.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+        if self.rng.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+
+    async def send_message(self, entity, text, **kwargs):
+        await self._call()
+        self.sent.append((time.perf_counter(), getattr(entity, 'id', entity)))
+        return FakeSentMessage(len(self.sent))
+
+    async def edit_message(self, entity, message_id, text, **kwargs):
+        await self._call()
+        self.edited += 1
+        return FakeSentMessage(message_id)
+
+    async def get_entity(self, target):
+        """Любой чат (например, из ROUTES) существует"""
+        entity_id = zlib.crc32(str(target).encode())
+        return CachedEntity(entity_id, entity_id, 'channel', str(target))
+
+    async def disconnect(self):
+        pass
@@ -1,18 +1,54 @@
+import time
+_import_started = time.perf_counter()
+
 import asyncio
 import re
 import logging
 import random
 from datetime import datetime, timezone, timedelta
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, errors
 import sqlite3
 import os
-from pymorphy3 import MorphAnalyzer
+import signal
 
-from config import API_ID, API_HASH, BOT_TOKEN, TARGET_GROUP, SESSION_NAME, GROUPS_TO_MONITOR, KEYWORDS, LOG_LEVEL
+from config import (API_ID, API_HASH, BOT_TOKEN, TARGET_GROUP, SESSION_NAME, GROUPS_TO_MONITOR, KEYWORDS, LOG_LEVEL,
+                    LEMMA_CACHE_SIZE, CURSOR_FLUSH_INTERVAL, BACKFILL_CONCURRENCY, BACKFILL_BATCH_SIZE,
+                    INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_QUEUE_POLICY, SEND_RATE_PER_MINUTE, SEND_BURST,
+                    RESOLVE_CONCURRENCY, SENDER_CACHE_SIZE, SENDER_CACHE_TTL,
+                    MATCH_WORKERS, MATCH_BATCH_SIZE, METRICS_PORT, METRICS_FILE, METRICS_INTERVAL,
+                    DEDUP_MODE, DEDUP_WINDOW_HOURS, DEDUP_MAX_ENTRIES, DEDUP_FOLD_DELAY,
+                    CONFIG_RELOAD_FILE, CONFIG_RELOAD_INTERVAL, read_reloadable_config, PROCESS_ENV_KEYS,
+                    SHARD_SESSIONS,
+                    OUTBOX_RETRY_INTERVAL, OUTBOX_RETENTION_DAYS, OFFER_ARCHIVE,
+                    DIGEST_WINDOW, DIGEST_MAX_ITEMS, DIGEST_INSTANT_KEYWORDS,
+                    GAP_RECOVERY, UPDATE_STATE_INTERVAL, GAP_MIN_MESSAGES,
+                    WATCHDOG_INTERVAL, WATCHDOG_STALL_FACTOR, WATCHDOG_MIN_SILENCE,
+                    WATCHDOG_MIN_STALLED_GROUPS, WATCHDOG_RECONNECT_INTERVAL,
+                    PROFILING, PROFILING_INTERVAL_MS, PROFILING_FLUSH_INTERVAL, ROUTES)
 from message_time_manager import MessageTimeManager
+from notification_sender import NotificationSender
+from outbox import NotificationOutbox
+from ingest import IngestQueue, CursorTracker
+from digest import NotificationDigest, DigestItem, split_digest
+from stall_watchdog import StallWatchdog
+from profiler import SamplingProfiler
+from update_state import MessageGapDetector, saved_channel_ids
+from offer_archive import OfferArchive
+from routing import RoutingTable, DEFAULT_TARGET, parse_target
+from entity_cache import EntityCache
+from shards import UserShard, shard_index
+from sender_cache import SenderCache
+from matching_pool import MatchingPool
+from metrics import metrics, MetricsExporter
+from dedup import OfferDeduplicator
+from keyword_index import KeywordIndex, expand_keyword
+from lemma_cache import LemmaCache
+from morph_loader import BackgroundAnalyzer
 
 
-morph = MorphAnalyzer()
+# Словари pymorphy3 загружаются в фоне при запуске, а не при импорте
+morph = BackgroundAnalyzer()
+metrics.record_boot('imports', time.perf_counter() - _import_started)
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,45 +57,177 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Ограничение Telegram на длину сообщения
+MAX_MESSAGE_LENGTH = 4096
+# Сколько ссылок на дубликаты показывать в уведомлении
+MAX_FOLDED_LINKS = 10
+# Сколько символов сообщения показывать в дайджесте
+DIGEST_EXCERPT_LENGTH = 300
+# Функции обработки сообщений, стеки через которые попадают в профиль
+PROFILED_FUNCTIONS = ('handle_new_message', 'process_live_message', 'find_keywords',
+                      'find_keywords_batch', 'process_found_message')
+# Этапы запуска в отчете о времени старта
+BOOT_STAGES = (
+    ('imports', 'импорты'),
+    ('session_start', 'запуск сессий'),
+    ('entity_resolution', 'получение групп'),
+    ('backfill', 'история'),
+    ('handlers', 'обработчики'),
+)
+
 class TelegramMonitor:
-    def __init__(self):
-        # Определяем директорию для сессий
+    def __init__(self, data_dir=None):
+        # Определяем директорию для сессий (data_dir задают нагрузочные тесты)
         # На хостинге используем /data, локально - ./data
-        if os.name == 'nt':  # Windows
-            data_dir = "./data"
-        else:  # Linux/Unix (хостинг)
-            data_dir = "/data"
+        if data_dir is None:
+            if os.name == 'nt':  # Windows
+                data_dir = "./data"
+            else:  # Linux/Unix (хостинг)
+                data_dir = "/data"
             
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
             print(f"📁 Создана директория для сессий")
         
-        # Userbot для мониторинга групп (от имени пользователя)
-        user_session_path = os.path.join(data_dir, f"{SESSION_NAME}_user")
-        self.user_client = TelegramClient(user_session_path, API_ID, API_HASH)
+        # Userbot для мониторинга групп (от имени пользователя); при
+        # шардировании каждая сессия отслеживает свою часть групп
+        self.shards = []
+        # До настройки обработчиков события копятся: их приносит догрузка
+        # пропущенного сразу после подключения
+        self.early_events = [] if GAP_RECOVERY else None
+        for name in SHARD_SESSIONS or [SESSION_NAME]:
+            client = self.create_user_client(os.path.join(data_dir, f"{name}_user"))
+            # Кэш групп у каждого аккаунта свой: access hash зависит от аккаунта
+            cache_name = 'entities.json' if name == SESSION_NAME else f"entities_{name}.json"
+            self.shards.append(UserShard(name, client, EntityCache(data_dir, cache_name)))
+        self.user_client = self.shards[0].client
         
         # Bot для отправки уведомлений (токен бота)
         bot_session_path = os.path.join(data_dir, f"{SESSION_NAME}_bot")
         self.bot_client = TelegramClient(bot_session_path, API_ID, API_HASH)
+        # FloodWait при отправке обрабатывает очередь уведомлений
+        self.bot_client.flood_sleep_threshold = 0
+        
+        # Очередь уведомлений с бюджетом отправок на каждый чат
+        self.notification_sender = NotificationSender(self.bot_client, SEND_RATE_PER_MINUTE, SEND_BURST)
         
         self.data_dir = data_dir  # Сохраняем для использования в других методах
         
         # Инициализируем менеджер времени сообщений
-        self.message_time_manager = MessageTimeManager(data_dir)
+        self.message_time_manager = MessageTimeManager(data_dir, write_behind=CURSOR_FLUSH_INTERVAL > 0)
+        
+        # Журнал уведомлений в той же базе: запись до сохранения курсора,
+        # отметка о доставке после отправки
+        self.outbox = NotificationOutbox(self.message_time_manager.db_path)
+        self.outbox_inflight = set()  # id записей, переданных в очередь отправки
+        self.outbox_task = None
+        
+        # Дайджест: найденные предложения копятся DIGEST_WINDOW секунд и
+        # отправляются одним сообщением; срочные ключевые слова - сразу
+        self.digest = None
+        if DIGEST_WINDOW > 0:
+            self.digest = NotificationDigest(self.send_digest, DIGEST_WINDOW, DIGEST_MAX_ITEMS)
+        self.instant_keywords = {keyword.lower() for keyword in DIGEST_INSTANT_KEYWORDS}
+        
+        # Архив найденных предложений для поиска (offers_cli.py)
+        self.offer_archive = OfferArchive(self.message_time_manager.db_path) if OFFER_ARCHIVE else None
+        
+        # Догрузка пропущенного: каналы с pts в сессии (имя сессии -> id каналов)
+        # и разрывы id сообщений, которые разница обновлений не закрыла
+        self.catch_up_channels = {}
+        self.gap_detector = MessageGapDetector(GAP_MIN_MESSAGES) if GAP_RECOVERY else None
+        self.update_state_task = None
+        
+        # Сторож потока событий: замечает замолчавшие группы и сессии
+        self.watchdog = StallWatchdog(WATCHDOG_STALL_FACTOR, WATCHDOG_MIN_SILENCE,
+                                      min_stalled_groups=WATCHDOG_MIN_STALLED_GROUPS,
+                                      reconnect_interval=WATCHDOG_RECONNECT_INTERVAL)
+        self.watchdog_task = None
+        
+        # Профайлер обработки сообщений (PROFILING или сигнал SIGUSR2)
+        self.profiler = SamplingProfiler(os.path.join(data_dir, 'profiles'), PROFILING_INTERVAL_MS / 1000,
+                                         PROFILING_FLUSH_INTERVAL, PROFILED_FUNCTIONS)
+        
+        # Очередь входящих сообщений: обработчик событий только ставит
+        # сообщение в очередь, поиск и отправку выполняют обработчики очереди
+        self.ingest_queue = IngestQueue(self.process_live_message, INGEST_WORKERS,
+                                        INGEST_QUEUE_SIZE, INGEST_QUEUE_POLICY)
+        self.cursor_tracker = CursorTracker()
+        
+        # Кэш профилей авторов для уведомлений
+        self.sender_cache = SenderCache(SENDER_CACHE_SIZE, SENDER_CACHE_TTL)
         
         self.target_entity = None  # Информация о целевой группе
+        self.route_entities = {}  # чат маршрута из ROUTES -> entity
+        self.routing = RoutingTable()  # Строится после получения чатов маршрутов
         self.start_time = None  # Время запуска бота
         self.groups_entities = {}
-        self.monitored_chats = []
+        self.chat_routes = {}  # id чата -> (URL группы, entity)
         self.saved_times = {}  # Кэш сохраненных времен
         
+        # Текущие списки групп и ключевых слов (меняются при перезагрузке конфигурации)
+        self.groups = list(GROUPS_TO_MONITOR)
+        self.keywords = list(KEYWORDS)
+        self.reload_lock = asyncio.Lock()
+        self.config_watch_task = None
+        self.background_tasks = set()
+        
+        # Дочитывание истории: не больше BACKFILL_CONCURRENCY групп одной сессии
+        # одновременно (при запуске и в фоне); FloodWait одной сессии не
+        # занимает слоты остальных. Уже дочитываемые группы не ставятся повторно
+        self.backfill_semaphores = {shard.name: asyncio.Semaphore(max(1, BACKFILL_CONCURRENCY)) for shard in self.shards}
+        self.backfilling = set()
+        
+        # Индекс ключевых слов компилируется при запуске и обновляется инкрементально
+        self.keyword_index = KeywordIndex(self.keywords)
+        
+        # Кэш нормальных форм слов, прогретый с прошлого запуска
+        self.lemma_cache = LemmaCache(morph, LEMMA_CACHE_SIZE)
+        self.lemma_cache.load(data_dir)
+        
+        # Пул процессов для поиска ключевых слов (при высокой нагрузке)
+        self.matching_pool = None
+        if MATCH_WORKERS > 0:
+            self.matching_pool = MatchingPool(self.keywords, MATCH_WORKERS, MATCH_BATCH_SIZE,
+                                              lemma_cache_size=LEMMA_CACHE_SIZE)
+        
+        # Индекс недавних предложений для подавления дубликатов
+        self.deduplicator = None
+        if DEDUP_MODE in ('suppress', 'fold'):
+            self.deduplicator = OfferDeduplicator(DEDUP_MAX_ENTRIES, DEDUP_WINDOW_HOURS * 3600)
+        
+        # Метрики этапов обработки: HTTP на localhost и/или файл
+        metrics_path = os.path.join(data_dir, METRICS_FILE) if METRICS_FILE else None
+        self.metrics_exporter = MetricsExporter(metrics, METRICS_PORT, metrics_path, METRICS_INTERVAL)
+        metrics.register_provider('lemma_cache', self.lemma_cache.stats)
+        metrics.register_provider('sender_cache', self.sender_cache.stats)
+        metrics.register_provider('notifications', self.notification_sender.stats)
+        metrics.register_provider('outbox', self.outbox.stats)
+        metrics.register_provider('ingest', self.ingest_queue.stats)
+        metrics.register_provider('watchdog', self.watchdog.stats)
+        metrics.register_provider('profiler', self.profiler.stats)
+        if self.digest is not None:
+            metrics.register_provider('digest', self.digest.stats)
+        if self.offer_archive is not None:
+            metrics.register_provider('offer_archive', self.offer_archive.stats)
+        if self.deduplicator is not None:
+            metrics.register_provider('dedup', self.deduplicator.stats)
+        
         
         
     async def init(self):
         """Инициализация и запуск системы"""
+        # Словари нужны только для поиска в event loop; у пула процессов свои
+        if not self.matching_pool:
+            morph.start()
+        
+        session_started = time.perf_counter()
+        if GAP_RECOVERY:
+            self.catch_up_channels = {shard.name: saved_channel_ids(shard.client.session) for shard in self.shards}
         try:
             # Запускаем userbot (потребует авторизации при первом запуске)
             await self.user_client.start()
+            await self.start_shards()
             self.start_time = datetime.now(timezone.utc)
             
             # Минимальная задержка для безопасности
@@ -71,10 +239,11 @@ class TelegramMonitor:
         except sqlite3.OperationalError as e:
             if "no such column: version" in str(e):
                 logger.error("❌ Поврежденная база данных сессии. Удаляем и пересоздаем...")
-                # Удаляем поврежденные файлы сессии
+                # Удаляем поврежденные файлы сессии (основной сессии userbot и бота)
+                primary = self.shards[0]
                 session_files = [
-                    os.path.join(self.data_dir, f"{SESSION_NAME}_user.session"),
-                    os.path.join(self.data_dir, f"{SESSION_NAME}_user.session-journal"),
+                    os.path.join(self.data_dir, f"{primary.name}_user.session"),
+                    os.path.join(self.data_dir, f"{primary.name}_user.session-journal"),
                     os.path.join(self.data_dir, f"{SESSION_NAME}_bot.session"),
                     os.path.join(self.data_dir, f"{SESSION_NAME}_bot.session-journal")
                 ]
@@ -84,12 +253,17 @@ class TelegramMonitor:
                         logger.info(f"🗑️ Удален файл сессии")
                 
                 # Пересоздаем клиенты и запускаем заново
-                user_session_path = os.path.join(self.data_dir, f"{SESSION_NAME}_user")
+                user_session_path = os.path.join(self.data_dir, f"{primary.name}_user")
                 bot_session_path = os.path.join(self.data_dir, f"{SESSION_NAME}_bot")
-                self.user_client = TelegramClient(user_session_path, API_ID, API_HASH)
+                self.user_client = self.create_user_client(user_session_path)
+                self.catch_up_channels.pop(primary.name, None)
                 self.bot_client = TelegramClient(bot_session_path, API_ID, API_HASH)
+                self.bot_client.flood_sleep_threshold = 0
+                self.notification_sender.client = self.bot_client
+                primary.client = self.user_client
                 
                 await self.user_client.start()
+                await self.start_shards()
                 # await asyncio.sleep(random.uniform(1, 2))
                 await self.bot_client.start(bot_token=BOT_TOKEN)
                 
@@ -97,12 +271,22 @@ class TelegramMonitor:
                 logger.info("✅ Сессии пересозданы успешно")
             else:
                 raise
+        metrics.record_boot('session_start', time.perf_counter() - session_started)
         
         print(f"✅ Система запущена в {self.start_time.strftime('%d.%m.%Y %H:%M')}")
+        
+        # Периодический сброс времен последних сообщений в базу
+        self.message_time_manager.start_flusher(CURSOR_FLUSH_INTERVAL)
+        
+        await self.metrics_exporter.start()
+        
+        if self.matching_pool:
+            self.matching_pool.start()
 
         # await asyncio.sleep(random.uniform(0.3, 0.7))
         
         # Получаем информацию о целевой группе
+        resolve_started = time.perf_counter()
         try:
             self.target_entity = await self.bot_client.get_entity(TARGET_GROUP)
             print(f"✅ Целевая группа настроена")
@@ -122,56 +306,466 @@ class TelegramMonitor:
             print("   • Бот добавлен в целевую группу")
             print("   • У бота есть права на отправку сообщений")
             print("   • ID группы указан правильно в TARGET_GROUP")
+        
+        await self.resolve_routes()
+        
+        # Досылаем уведомления, не доставленные до остановки
+        self.outbox.prune(OUTBOX_RETENTION_DAYS)
+        await self.resume_outbox()
+        self.start_outbox_retry()
             
         # Получаем информацию о группах для мониторинга
         await self.get_groups_info()
+        metrics.record_boot('entity_resolution', time.perf_counter() - resolve_started)
         
-        # Загружаем сохраненные времена
-        await self.load_saved_times()
-        
-        # Обрабатываем исторические сообщения
-        await self.process_historical_messages()
+        with metrics.boot_stage('backfill'):
+            # Загружаем сохраненные времена
+            await self.load_saved_times()
+            self.seed_gap_detector()
+            
+            # Обрабатываем исторические сообщения
+            await self.process_historical_messages()
         
         # Настраиваем обработчик событий
-        await self.setup_event_handlers()
+        with metrics.boot_stage('handlers'):
+            await self.setup_event_handlers()
+        
+        # Пропущенное после подключения догружается разницей обновлений
+        await self.start_gap_recovery()
+        self.start_watchdog()
+        
+        self.log_boot_profile()
+        
+        # Перезагрузка ключевых слов и групп без перезапуска клиентов
+        self.start_config_watch()
+        self.start_profiler()
 
+    async def resolve_routes(self):
+        """Получает чаты маршрутов ROUTES и строит таблицу маршрутов.
+
+        Маршрут, чат которого получить не удалось, не используется: его
+        предложения уходят в TARGET_GROUP.
+        """
+        if not ROUTES:
+            return
+        known = {keyword.lower() for keyword in self.keywords}
+        for target, keywords in ROUTES:
+            if target in self.route_entities:
+                continue
+            try:
+                self.route_entities[target] = await self.bot_client.get_entity(parse_target(target))
+            except Exception as e:
+                print(f"❌ Ошибка получения чата маршрута {target}: {type(e).__name__}")
+                continue
+            unknown = [keyword for keyword in keywords if keyword.lower() not in known]
+            if unknown:
+                print(f"⚠️ Ключевых слов маршрута {target} нет в KEYWORDS: {', '.join(unknown)}")
+        self.routing = RoutingTable([route for route in ROUTES if route[0] in self.route_entities])
+        print(f"🧭 Маршрутов уведомлений: {len(self.route_entities)} из {len(ROUTES)}")
+    
+    def target_for(self, target):
+        """Целевой чат маршрута; TARGET_GROUP для '' и неизвестных маршрутов"""
+        return self.route_entities.get(target, self.target_entity)
+    
+    async def start_shards(self):
+        """Запускает дополнительные сессии userbot (основная уже запущена)"""
+        for shard in self.shards:
+            if shard.client is not self.user_client:
+                await shard.client.start()
+        if len(self.shards) > 1:
+            print(f"🧩 Запущено {len(self.shards)} сессий userbot")
+    
+    def shard_for(self, group_url):
+        """Сессия, за которой закреплена группа"""
+        return self.shards[shard_index(group_url, len(self.shards))]
+    
     async def get_groups_info(self):
         """Получает информацию о группах для мониторинга через userbot"""
         print(f"📋 Настройка мониторинга групп...")
         
-        for i, group_url in enumerate(GROUPS_TO_MONITOR):
-            try:
-                # Минимальная задержка между запросами для безопасности
-                if i > 0:
-                    pass
-                    # delay = random.uniform(0.2, 0.5)
-                    # await asyncio.sleep(delay)
-                
-                # Преобразуем URL в entity через userbot
-                entity = await self.url_to_entity(group_url)
-                if entity:
-                    self.groups_entities[group_url] = entity
-                    self.monitored_chats.append(entity.id)
-                else:
-                    print('Ошибка преобразования URL в entity через userbot')
-                    
-            except Exception as _:
-                print(f"❌ Ошибка при получении группы")
-                
-        print(f"📊 Успешно настроено {len(self.groups_entities)} групп из {len(GROUPS_TO_MONITOR)}")
+        # Группы, разрешенные при прошлых запусках, берем из кэша
+        for shard in self.shards:
+            shard.entity_cache.load()
+            shard.entity_cache.retain(url for url in self.groups if self.shard_for(url) is shard)
         
-        # Минимальная финальная задержка
-        # await asyncio.sleep(random.uniform(0.3, 0.7))
+        await self.resolve_groups(self.groups)
+        
+        for group_url in self.groups:
+            entity = self.shard_for(group_url).entity_cache.get(group_url)
+            if entity:
+                self.add_group(group_url, entity)
+                
+        print(f"📊 Успешно настроено {len(self.groups_entities)} групп из {len(self.groups)}")
         
         # Добавляем диагностику состояния мониторинга
         await self.log_monitoring_status()
     
+    async def resolve_groups(self, urls):
+        """Разрешает параллельно URL, которых еще нет в кэше групп, и сохраняет кэш.
+        
+        Каждый URL разрешается сессией, за которой закреплена группа.
+        """
+        new_urls = [url for url in dict.fromkeys(urls) if self.shard_for(url).entity_cache.get(url) is None]
+        if new_urls:
+            print(f"🔎 Получение информации о {len(new_urls)} новых группах...")
+            semaphores = {shard.name: asyncio.Semaphore(max(1, RESOLVE_CONCURRENCY)) for shard in self.shards}
+            
+            async def resolve(group_url):
+                shard = self.shard_for(group_url)
+                async with semaphores[shard.name]:
+                    try:
+                        # Преобразуем URL в entity через userbot
+                        entity = await self.url_to_entity(group_url, shard.client)
+                        if entity:
+                            shard.entity_cache.put(group_url, entity)
+                        else:
+                            print('Ошибка преобразования URL в entity через userbot')
+                    except Exception as _:
+                        print(f"❌ Ошибка при получении группы")
+            
+            await asyncio.gather(*(resolve(url) for url in new_urls))
+        for shard in self.shards:
+            shard.entity_cache.save()
+    
+    def add_group(self, group_url, entity):
+        """Добавляет группу в мониторинг и в таблицу маршрутизации по id чата"""
+        self.groups_entities[group_url] = entity
+        self.chat_routes[entity.peer_id] = (group_url, entity)
+        shard = self.shard_for(group_url)
+        shard.add_chat(entity.peer_id)
+        if len(self.shards) > 1:
+            metrics.update_group(group_url, shard=shard.name)
+    
+    def remove_group(self, group_url):
+        """Убирает группу из мониторинга"""
+        entity = self.groups_entities.pop(group_url, None)
+        if entity is None:
+            return
+        metrics.groups.pop(group_url, None)
+        if any(other.peer_id == entity.peer_id for other in self.groups_entities.values()):
+            return
+        self.chat_routes.pop(entity.peer_id, None)
+        self.cursor_tracker.forget(group_url)
+        self.watchdog.forget(group_url)
+        if self.gap_detector is not None:
+            self.gap_detector.forget(group_url)
+        self.shard_for(group_url).remove_chat(entity.peer_id)
+    
+    async def update_groups(self, groups):
+        """Применяет новый список групп: разрешаются и дочитываются только новые"""
+        removed = [url for url in self.groups_entities if url not in groups]
+        for group_url in removed:
+            self.remove_group(group_url)
+        
+        self.groups = list(groups)
+        for shard in self.shards:
+            shard.entity_cache.retain(url for url in self.groups if self.shard_for(url) is shard)
+        new_urls = [url for url in dict.fromkeys(self.groups) if url not in self.groups_entities]
+        await self.resolve_groups(new_urls)
+        
+        added = {}
+        for group_url in new_urls:
+            entity = self.shard_for(group_url).entity_cache.get(group_url)
+            if entity:
+                self.add_group(group_url, entity)
+                added[group_url] = entity
+        print(f"🔁 Группы: добавлено {len(added)}, удалено {len(removed)}, "
+              f"отслеживается {len(self.groups_entities)} из {len(self.groups)}")
+        
+        # Новые группы дочитываем в фоне, как при запуске
+        if added:
+            self.schedule_backfill(added)
+    
+    def schedule_backfill(self, groups):
+        """Дочитывает историю групп {URL: entity} в фоне с сохраненных курсоров"""
+        groups = {url: entity for url, entity in groups.items() if url not in self.backfilling}
+        if not groups:
+            return
+        
+        async def backfill():
+            await self.message_time_manager.flush_async()
+            self.saved_times = self.message_time_manager.get_all_last_times()
+            await asyncio.gather(*(self.run_backfill(url, entity) for url, entity in groups.items()))
+        
+        task = asyncio.get_running_loop().create_task(backfill())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    async def run_backfill(self, group_url, entity):
+        """Дочитывает группу в слоте своей сессии; повторный вызов для той же группы пропускается"""
+        if group_url in self.backfilling:
+            return 0, 0
+        self.backfilling.add(group_url)
+        try:
+            async with self.backfill_semaphores[self.shard_for(group_url).name]:
+                return await self.backfill_group(group_url, entity)
+        finally:
+            self.backfilling.discard(group_url)
+    
+    def create_user_client(self, session_path):
+        """Клиент userbot; с GAP_RECOVERY Telethon при подключении загружает
+        состояние обновлений из сессии и догружает пропущенное"""
+        client = TelegramClient(session_path, API_ID, API_HASH, catch_up=GAP_RECOVERY)
+        if self.early_events is not None:
+            client.add_event_handler(self.buffer_early_event, events.NewMessage())
+        return client
+    
+    async def buffer_early_event(self, event):
+        """Запоминает событие, пришедшее до настройки обработчиков"""
+        if self.early_events is not None:
+            self.early_events.append(event)
+    
+    def covered_by_catch_up(self, group_url, entity):
+        """Догрузит ли группу разница обновлений (pts канала сохранен в сессии)"""
+        channels = self.catch_up_channels.get(self.shard_for(group_url).name, ())
+        return getattr(entity, 'kind', None) == 'channel' and entity.id in channels
+    
+    def seed_gap_detector(self):
+        """Разрыв в каналах, догружаемых разницей, считается от сохраненного курсора"""
+        if self.gap_detector is None:
+            return
+        for group_url, entity in self.groups_entities.items():
+            saved = self.saved_times.get(group_url)
+            if saved and saved[3] and self.covered_by_catch_up(group_url, entity):
+                self.gap_detector.seed(group_url, saved[3])
+    
+    def check_message_gap(self, group_url, entity, message_id):
+        """Скачок id сообщений канала - возможно, пропущенные обновления: проверяем в фоне"""
+        if self.gap_detector is None or getattr(entity, 'kind', None) != 'channel':
+            return
+        missing = self.gap_detector.observe(group_url, message_id)
+        if missing:
+            task = asyncio.get_running_loop().create_task(
+                self.confirm_message_gap(group_url, entity, message_id - missing - 1, message_id))
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
+    
+    async def confirm_message_gap(self, group_url, entity, min_id, max_id):
+        """Дочитывает историю группы, если в разрыве id есть сообщения с текстом.
+        
+        Такие же скачки оставляют служебные сообщения (вступления, закрепления)
+        и массовое удаление, поэтому разрыв проверяется одним запросом истории.
+        """
+        missing = max_id - min_id - 1
+        limit = min(missing, 100)
+        try:
+            messages = await self.shard_for(group_url).client.get_messages(
+                entity, limit=limit, min_id=min_id, max_id=max_id)
+        except Exception as e:
+            # Проверить не удалось: дочитываем историю, чтобы не потерять сообщения
+            logger.error(f"❌ Ошибка проверки разрыва сообщений: {type(e).__name__}")
+            messages = None
+        # Весь разрыв виден, если запрос вернул неполную страницу или охватил все id
+        if messages is not None and (len(messages) < limit or limit == missing) \
+                and not any(getattr(message, 'text', None) for message in messages):
+            metrics.inc('update_gaps_ignored')
+            return
+        metrics.inc('update_gaps')
+        print(f"🕳️ Пропущено около {missing} сообщений группы: дочитываем историю")
+        self.schedule_backfill({group_url: entity})
+    
+    async def start_gap_recovery(self):
+        """Запрашивает пропущенное с момента подключения и периодически сохраняет сессии"""
+        if not GAP_RECOVERY:
+            return
+        for shard in self.shards:
+            await shard.client.catch_up()
+        
+        # Состояние обновлений Telethon пишет в сессию раз в минуту и при
+        # отключении; остальные изменения сессии фиксируем на диске чаще
+        if UPDATE_STATE_INTERVAL > 0 and self.update_state_task is None:
+            async def save_loop():
+                while True:
+                    await asyncio.sleep(UPDATE_STATE_INTERVAL)
+                    self.save_sessions()
+            
+            self.update_state_task = asyncio.get_running_loop().create_task(save_loop())
+    
+    def start_watchdog(self):
+        """Периодически проверяет, не остановился ли поток событий"""
+        if WATCHDOG_INTERVAL <= 0 or self.watchdog_task is not None:
+            return
+        
+        async def watchdog_loop():
+            while True:
+                await asyncio.sleep(WATCHDOG_INTERVAL)
+                try:
+                    await self.check_stalls()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка проверки потока событий: {e}")
+        
+        self.watchdog_task = asyncio.get_running_loop().create_task(watchdog_loop())
+    
+    async def check_stalls(self):
+        """Переподключает замолчавшие сессии и дочитывает историю замолчавших групп.
+        
+        Тишина подтверждается запросом последнего сообщения каждой замолчавшей
+        группы: если новых сообщений нет (тихая ночь), группа просто молчит и
+        ни переподключение, ни дочитывание не нужны.
+        """
+        self.watchdog.checks += 1
+        stalled_shards = set(self.watchdog.stalled_shards())
+        stalled_groups = [url for url in self.watchdog.stalled_groups() if url in self.groups_entities]
+        
+        for shard in self.shards:
+            groups = {url: self.groups_entities[url] for url in stalled_groups if self.shard_for(url) is shard}
+            missed = {}
+            quiet = []
+            for url, entity in groups.items():
+                probe = await self.probe_group(url, entity)
+                if probe:
+                    missed[url] = entity
+                elif probe is not None:
+                    quiet.append(url)
+            if quiet:
+                self.watchdog.quiet += len(quiet)
+                self.watchdog.acknowledge(quiet)
+            
+            if shard.name in stalled_shards:
+                if missed:
+                    # Сессия не получает обновлений, хотя в группах есть новые сообщения
+                    print(f"🐶 Сессия userbot не получает обновления: переподключение")
+                    self.watchdog.stalls += 1
+                    self.watchdog.reconnects += 1
+                    await shard.reconnect()
+                self.watchdog.acknowledge(shards=[shard.name])
+            if missed:
+                print(f"🐶 Группы молчат дольше обычного: дочитываем историю {len(missed)} групп")
+                self.watchdog.stalls += len(missed)
+                self.schedule_backfill(missed)
+                self.watchdog.acknowledge(missed)
+        
+        for url in self.groups_entities:
+            state = self.watchdog.group_state(url)
+            if state is not None:
+                metrics.update_group(url, **state)
+    
+    async def probe_group(self, group_url, entity):
+        """Есть ли в группе сообщения новее последнего полученного (один запрос).
+        
+        None - проверить не удалось (FloodWait), решение откладывается до следующей проверки.
+        """
+        self.watchdog.probes += 1
+        try:
+            messages = await self.shard_for(group_url).client.get_messages(entity, limit=1)
+        except errors.FloodWaitError:
+            return None
+        except Exception as e:
+            # Сессия не отвечает на запросы: считаем остановку подтвержденной
+            logger.error(f"❌ Ошибка проверки группы: {type(e).__name__}")
+            return True
+        if not messages:
+            return False
+        last_id = self.watchdog.last_message_id(group_url)
+        # Найденное сообщение дочитывается один раз: следующая проверка сравнивает с ним
+        self.watchdog.note_message_id(group_url, messages[0].id)
+        return last_id is None or messages[0].id > last_id
+    
+    def save_sessions(self):
+        """Сохраняет сессии userbot на диск"""
+        for shard in self.shards:
+            try:
+                shard.client.session.save()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения сессии: {type(e).__name__}")
+    
+    async def reload_config(self):
+        """Перечитывает KEYWORDS и GROUPS_TO_MONITOR без перезапуска клиентов"""
+        async with self.reload_lock:
+            started = time.perf_counter()
+            path = CONFIG_RELOAD_FILE or '.env'
+            if not os.path.exists(path):
+                # Без файла перечитывается неизменное окружение процесса
+                print(f"⚠️ Файл конфигурации {path} не найден - перезагружать нечего")
+                return
+            shadowed = [key for key in ('GROUPS_TO_MONITOR', 'KEYWORDS') if key in PROCESS_ENV_KEYS]
+            if shadowed:
+                print(f"⚠️ {', '.join(shadowed)} заданы в переменных окружения и важнее файла {path}")
+            try:
+                groups, keywords = read_reloadable_config(path)
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения конфигурации: {e}")
+                return
+            
+            if not keywords:
+                print("⚠️ Пустой список ключевых слов - конфигурация не применена")
+                return
+            
+            if keywords != self.keywords:
+                added, removed = self.keyword_index.update(keywords)
+                self.keywords = list(keywords)
+                if self.matching_pool:
+                    self.matching_pool.update_keywords(self.keywords)
+                print(f"🔁 Ключевые слова: добавлено {len(added)}, удалено {len(removed)}, всего {len(self.keywords)}")
+            
+            if groups != self.groups:
+                await self.update_groups(groups)
+            
+            metrics.inc('config_reloads')
+            print(f"✅ Конфигурация перезагружена за {(time.perf_counter() - started) * 1000:.1f} мс")
+    
+    def start_profiler(self):
+        """Профилирование с запуска (PROFILING) и переключение по SIGUSR2"""
+        if PROFILING:
+            self.profiler.start()
+        
+        if hasattr(signal, 'SIGUSR2'):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, self.profiler.toggle)
+            except (NotImplementedError, RuntimeError):
+                pass
+    
+    def start_config_watch(self):
+        """Перезагрузка конфигурации по SIGHUP и при изменении CONFIG_RELOAD_FILE"""
+        loop = asyncio.get_running_loop()
+        
+        def schedule_reload():
+            task = loop.create_task(self.reload_config())
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
+        
+        if hasattr(signal, 'SIGHUP'):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, schedule_reload)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        if CONFIG_RELOAD_FILE and CONFIG_RELOAD_INTERVAL > 0:
+            async def watch_loop():
+                last_mtime = None
+                while True:
+                    try:
+                        mtime = os.stat(CONFIG_RELOAD_FILE).st_mtime
+                    except OSError:
+                        mtime = None
+                    if last_mtime is not None and mtime is not None and mtime != last_mtime:
+                        await self.reload_config()
+                    if mtime is not None:
+                        last_mtime = mtime
+                    await asyncio.sleep(CONFIG_RELOAD_INTERVAL)
+            
+            self.config_watch_task = loop.create_task(watch_loop())
+            print(f"👀 Отслеживаются изменения файла конфигурации")
+    
+    async def stop_config_watch(self):
+        if self.config_watch_task is not None:
+            self.config_watch_task.cancel()
+            try:
+                await self.config_watch_task
+            except asyncio.CancelledError:
+                pass
+            self.config_watch_task = None
+        for task in list(self.background_tasks):
+            task.cancel()
+    
     async def log_monitoring_status(self):
         """Выводит диагностическую информацию о состоянии мониторинга"""
-        print(f"📊 Успешно настроено {len(self.groups_entities)} групп из {len(GROUPS_TO_MONITOR)}")
+        print(f"📊 Успешно настроено {len(self.groups_entities)} групп из {len(self.groups)}")
         
         if self.target_entity:
             print(f"🎯 Целевая группа настроена")
+            if self.route_entities:
+                print(f"🧭 Маршруты уведомлений: {', '.join(self.route_entities)}")
         else:
             print(f"❌ Целевая группа НЕ настроена")
     
@@ -182,51 +776,138 @@ class TelegramMonitor:
         print(f"✅ Загружено {len(self.saved_times)} сохраненных времен")
     
     async def process_historical_messages(self):
-        """Обрабатывает исторические сообщения при запуске"""
+        """Обрабатывает исторические сообщения при запуске (группы параллельно)"""
         print("🕒 Обработка исторических сообщений...")
         
+        # История не срочная: дожидаемся словарей, чтобы не пропустить словоформы
+        if not self.matching_pool and not morph.ready:
+            print("🧠 Ожидание загрузки словарей pymorphy3...")
+            await morph.wait_async()
+        
+        # Каналы с сохраненным pts догрузит catch-up после настройки обработчиков
+        groups = {url: entity for url, entity in self.groups_entities.items()
+                  if not self.covered_by_catch_up(url, entity)}
+        if len(groups) < len(self.groups_entities):
+            print(f"📡 {len(self.groups_entities) - len(groups)} групп будут догружены по состоянию обновлений")
+        
+        results = await asyncio.gather(
+            *(self.run_backfill(group_url, entity) for group_url, entity in groups.items())
+        )
+        processed_count = sum(processed for processed, _ in results)
+        found_count = sum(found for _, found in results)
+        
+        print(f"📊 Обработка завершена: {processed_count} сообщений, найдено {found_count} с ключевыми словами")
+        self.log_cache_stats()
+    
+    def log_boot_profile(self):
+        """Выводит длительность этапов запуска"""
+        stages = [(label, metrics.boot[stage]) for stage, label in BOOT_STAGES if stage in metrics.boot]
+        total = sum(seconds for _, seconds in stages)
+        print(f"⏱️ Запуск за {total:.2f} с: " + ", ".join(f"{label} {seconds:.2f} с" for label, seconds in stages))
+        if morph.load_time is not None:
+            print(f"🧠 Словари pymorphy3 (в фоне): {morph.load_time:.2f} с")
+            metrics.record_boot('morph_load', morph.load_time)
+    
+    def log_cache_stats(self):
+        """Выводит статистику кэшей нормальных форм и авторов"""
+        stats = self.lemma_cache.stats()
+        print(f"🧠 Кэш лемм: {stats['size']} слов, попаданий {stats['hits']}, "
+              f"промахов {stats['misses']} ({stats['hit_rate']:.0%})")
+        stats = self.sender_cache.stats()
+        print(f"👥 Кэш авторов: {stats['size']} профилей, попаданий {stats['hits']}, "
+              f"промахов {stats['misses']} ({stats['hit_rate']:.0%})")
+    
+    async def backfill_group(self, group_url, entity):
+        """Дочитывает историю одной группы с сохраненного курсора.
+        
+        Возвращает (обработано сообщений, найдено с ключевыми словами).
+        """
         processed_count = 0
         found_count = 0
+        client = self.shard_for(group_url).client
         
-        for group_url, entity in self.groups_entities.items():
-            try:
-                # Определяем время, с которого начинать поиск
-                if group_url in self.saved_times:
-                    since_time = self.saved_times[group_url][0]
-                    print(f"📅 Группа: поиск с {since_time.strftime('%d.%m.%Y %H:%M')}")
-                else:
-                    since_time = self.message_time_manager.get_fallback_time(10)
-                    print(f"🆕 Новая группа: поиск за последние 10 минут")
+        # Определяем, с какого места начинать поиск
+        saved = self.saved_times.get(group_url)
+        if saved and saved[3]:
+            # Продолжаем строго после последнего обработанного сообщения
+            cursor = {'min_id': saved[3]}
+            print(f"📅 Группа: поиск с {saved[0].strftime('%d.%m.%Y %H:%M')}")
+        elif saved:
+            cursor = {'offset_date': saved[0]}
+            print(f"📅 Группа: поиск с {saved[0].strftime('%d.%m.%Y %H:%M')}")
+        else:
+            cursor = {'offset_date': self.message_time_manager.get_fallback_time(10)}
+            print(f"🆕 Новая группа: поиск за последние 10 минут")
+        
+        # Сообщения проверяются пачками: каждое слово пачки лемматизируется один раз
+        batch = []
+        held = False  # Курсор остановлен на сообщении, которое не удалось записать в журнал
+        
+        async def process_batch():
+            nonlocal processed_count, found_count, held
+            messages = batch[:]
+            batch.clear()
+            if not messages:
+                return
+            
+            results = await self.match_keywords_batch([message.text for message in messages])
+            for message, keywords in zip(messages, results):
+                processed_count += 1
+                metrics.inc('backfill_messages')
                 
-                # Получаем сообщения с указанного времени
-                messages_processed = 0
-                async for message in self.user_client.iter_messages(entity, offset_date=since_time, reverse=True):
+                if keywords:
+                    found_count += 1
+                    metrics.inc('backfill_matches')
+                    print(f"🎯 Найдено историческое сообщение с ключевыми словами")
+                    try:
+                        await self.process_found_message(message, entity, keywords, live=False)
+                    except Exception:
+                        # Сообщение будет прочитано снова после перезапуска: курсор
+                        # (и курсор новых сообщений группы) остается перед ним
+                        if not held:
+                            self.cursor_tracker.hold(group_url, message.id)
+                            held = True
+                
+                # Курсор сохраняется после записи уведомления в журнал
+                if not held:
+                    await self.save_message_time(group_url, entity, message)
+            
+            metrics.update_group(group_url, backfill_processed=processed_count, backfill_found=found_count)
+        
+        metrics.update_group(group_url, backfill_status='running', backfill_processed=0, backfill_found=0)
+        while True:
+            try:
+                async for message in client.iter_messages(entity, reverse=True, **cursor):
+                    # При повторе после FloodWait продолжаем с этого места
+                    cursor = {'min_id': message.id}
+                    
                     if not message.text:
                         continue
                     
-                    messages_processed += 1
-                    processed_count += 1
-                    
-                    # Сохраняем время каждого обработанного сообщения
-                    await self.save_message_time(group_url, entity, message)
-                    
-                    # Проверяем на ключевые слова
-                    keywords = self.find_keywords(message.text)
-                    if keywords:
-                        found_count += 1
-                        print(f"🎯 Найдено историческое сообщение с ключевыми словами")
-                        await self.process_found_message(message, entity, keywords)
-                
-                if messages_processed > 0:
-                    print(f"✅ Группа: обработано {messages_processed} сообщений")
-                
-                # Небольшая задержка между группами
-                await asyncio.sleep(0.5)
+                    batch.append(message)
+                    if len(batch) >= BACKFILL_BATCH_SIZE:
+                        await process_batch()
+                await process_batch()
+                break
                 
+            except errors.FloodWaitError as e:
+                # Уже полученные сообщения обрабатываем до паузы
+                await process_batch()
+                print(f"⏳ Ограничение Telegram: пауза {e.seconds} с для группы")
+                await asyncio.sleep(e.seconds)
             except Exception as e:
                 logger.error(f"❌ Ошибка обработки исторических сообщений для группы: {e}")
+                try:
+                    await process_batch()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обработки исторических сообщений для группы: {e}")
+                break
         
-        print(f"📊 Обработка завершена: {processed_count} сообщений, найдено {found_count} с ключевыми словами")
+        if processed_count > 0:
+            print(f"✅ Группа: обработано {processed_count} сообщений")
+        metrics.update_group(group_url, backfill_status='done')
+        
+        return processed_count, found_count
     
     async def save_message_time(self, group_url: str, entity, message):
         """Сохраняет время сообщения в базу данных"""
@@ -236,9 +917,10 @@ class TelegramMonitor:
             if message_time.tzinfo is None:
                 message_time = message_time.replace(tzinfo=timezone.utc)
             
-            self.message_time_manager.save_last_message_time(
-                group_url, entity.id, group_name, message_time, message.id
-            )
+            with metrics.timer('cursor_save'):
+                self.message_time_manager.save_last_message_time(
+                    group_url, entity.id, group_name, message_time, message.id
+                )
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения времени сообщения: {e}")
         
@@ -246,35 +928,30 @@ class TelegramMonitor:
         """Настраивает обработчики событий для мониторинга через userbot"""
         print("🔧 Настройка обработчиков событий...")
         
-        @self.user_client.on(events.NewMessage(chats=self.monitored_chats))
         async def handle_new_message(event):
-            """Обработчик новых сообщений"""
+            """Обработчик новых сообщений: только ставит сообщение в очередь"""
             try:
+                metrics.inc('events_received')
+                metrics.observe_lag('event_receipt_lag', event.date)
+                
+                # Любое событие группы - признак живого потока обновлений
+                route = self.chat_routes.get(event.chat_id)
+                if route:
+                    self.watchdog.record(route[0], self.shard_for(route[0]).name, message_id=event.message.id)
+                    self.check_message_gap(route[0], route[1], event.message.id)
+                
                 # Пропускаем сообщения без текста
                 if not event.text:
                     return
                 
-                # Получаем информацию о группе
-                chat = await event.get_chat()
-                
-                # Находим URL группы для сохранения времени
-                group_url = None
-                for url, entity in self.groups_entities.items():
-                    if entity.id == chat.id:
-                        group_url = url
-                        break
+                message = event.message
+                if route:
+                    self.cursor_tracker.begin(route[0], message.id)
                 
-                # Сохраняем время каждого обработанного сообщения
-                if group_url:
-                    await self.save_message_time(group_url, chat, event)
-                
-                # Проверяем на ключевые слова
-                keywords = self.find_keywords(event.text)
-                if keywords:
-                    print(f"🎯 Найдено сообщение с ключевыми словами")
-                    
-                    # Передаем уже найденные ключевые слова
-                    await self.process_found_message(event, chat, keywords)
+                dropped = await self.ingest_queue.put(message)
+                if dropped is not None:
+                    metrics.inc('ingest_dropped')
+                    await self.finish_live_message(dropped, None)
                     
             except Exception as e:
                 # Обезличенный вывод ошибки
@@ -285,10 +962,74 @@ class TelegramMonitor:
                 safe_error = safe_error.replace(str(event.id), "MSG_ID") if hasattr(event, 'id') else safe_error
                 logger.error(f"❌ Ошибка в обработчике сообщений: {error_type} - {safe_error[:100]}")
         
+        # Каждая сессия получает события только своих групп; список чатов
+        # фильтра меняется на месте при перезагрузке групп
+        for shard in self.shards:
+            shard.message_filter = events.NewMessage(chats=shard.monitored_chats)
+            shard.client.add_event_handler(handle_new_message, shard.message_filter)
+        
+        # События, догруженные при подключении, проходят тот же путь
+        early, self.early_events = self.early_events or [], None
+        for shard in self.shards:
+            shard.client.remove_event_handler(self.buffer_early_event)
+        replayed = 0
+        for event in early:
+            shard = next((shard for shard in self.shards if shard.client is getattr(event, 'client', None)), None)
+            if shard is not None and event.chat_id in shard.monitored_chats:
+                await handle_new_message(event)
+                replayed += 1
+        if replayed:
+            print(f"📡 Догружено пропущенных сообщений: {replayed}")
+        
         print("✅ Обработчики событий настроены")
+    
+    async def process_live_message(self, message):
+        """Обрабатывает сообщение из очереди входящих"""
+        processed = False
+        failed = False
+        try:
+            # Находим группу по id чата без запросов к Telegram
+            with metrics.timer('get_chat'):
+                route = self.chat_routes.get(message.chat_id)
+                chat = route[1] if route else await message.get_chat()
+            
+            # Проверяем на ключевые слова
+            keywords = await self.match_keywords(message.text)
+            if keywords:
+                metrics.inc('live_matches')
+                print(f"🎯 Найдено сообщение с ключевыми словами")
+                
+                # Передаем уже найденные ключевые слова
+                await self.process_found_message(message, chat, keywords)
+            processed = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Курсор сохраняется после записи уведомления в журнал: при
+            # сбое сообщение будет прочитано снова, а журнал не даст отправить его дважды
+            await self.finish_live_message(message, processed, failed)
+    
+    async def finish_live_message(self, message, processed, failed=False):
+        """Сдвигает курсор группы, когда обработаны все более ранние сообщения из очереди.
+        
+        Сообщение, обработка которого завершилась ошибкой (failed), остается
+        незавершенным: курсор группы не сдвинется дальше него до перезапуска.
+        """
+        route = self.chat_routes.get(message.chat_id)
+        if not route:
+            return
+        group_url, chat = route
+        self.watchdog.observe_lag(group_url, self.shard_for(group_url).name, message.date)
+        if failed:
+            return
+        last = self.cursor_tracker.finish(group_url, message.id, message if processed else None)
+        if last is not None:
+            await self.save_message_time(group_url, chat, last)
         
-    async def url_to_entity(self, url):
+    async def url_to_entity(self, url, client=None):
         """Преобразует URL группы в entity через userbot"""
+        client = client or self.user_client
         try:
             # Убираем префикс t.me/
             if url.startswith('t.me/'):
@@ -299,16 +1040,16 @@ class TelegramMonitor:
             # Обрабатываем разные типы ссылок
             if url.startswith('+'):
                 # Инвайт-ссылка
-                return await self.user_client.get_entity(url)
+                return await client.get_entity(url)
             if 'c/' in url:
                 # Приватная группа
                 parts = url.split('c/')[1].split('/')
                 chat_id = int(parts[0])
-                return await self.user_client.get_entity(f"-100{chat_id}")
+                return await client.get_entity(f"-100{chat_id}")
             else:
                 # Обычная группа/канал
                 username = url.split('/')[0]
-                return await self.user_client.get_entity(username)
+                return await client.get_entity(username)
                 
         except Exception as _:
             logger.error(f"Ошибка преобразования URL группы")
@@ -316,65 +1057,36 @@ class TelegramMonitor:
 
 
     def expand_keyword(self, keyword):
-        forms = set()
-        keyword = keyword.lower()
-        forms.add(keyword)
-
-        endings = [
-            '', 'а', 'ы', 'и', 'у', 'е', 'ой', 'ом', 'я', 'ей', 'ых', 'ый', 'ь', 'ка', 'ки', 'ку', 'кой',
-            'цы', 'ц', 'ца', 'ец', 'ок', 'ик', 'ист', 'истка', 'истки', 'щик', 'щица', 'нщик', 'нщица', 'ант', 'антка',
-            'льную', 'льная', 'льный', 'нт', 'нтка', 'ьный'
-        ]
-
-        for end in endings:
-            form = keyword + end
-            if len(form) <= len(keyword) + 5:
-                forms.add(form)
-        return forms
+        """Возвращает множество словоформ ключевого слова"""
+        return expand_keyword(keyword)
 
+    def lemmatize(self, word):
+        """Возвращает нормальную форму слова через кэш pymorphy3"""
+        return self.lemma_cache.lemmatize(word)
 
     def find_keywords(self, text):
-        ALLOWED_WORDS = set()
-        for kw in KEYWORDS:
-            ALLOWED_WORDS.update(self.expand_keyword(kw))
-
-        # Преобразуем в нижний регистр
-        ALLOWED_WORDS = {w.lower() for w in ALLOWED_WORDS}
-
+        """Ищет ключевые слова в тексте через скомпилированный индекс"""
         if not text:
             return []
-
-        # Очистка текста: оставляем только буквы, дефисы внутри слов, пробелы
-        text_clean = re.sub(r'[^а-яёa-z0-9\s\-]', ' ', text.lower())
-        text_clean = re.sub(r'\s+', ' ', text_clean).strip()
-
-        words = text_clean.split()
-        matched = set()
-
-        for word in words:
-            word = word.strip('-')
-            if len(word) < 2:
-                continue
-
-            if word in ALLOWED_WORDS:
-                for kw in KEYWORDS:
-                    if word.startswith(kw.lower()):
-                        matched.add(kw)
-                        break
-                continue
-
-            try:
-                parses = morph.parse(word)
-                if parses:
-                    lemma = parses[0].normal_form
-                    if lemma in ALLOWED_WORDS:
-                        for kw in KEYWORDS:
-                            if lemma.startswith(kw.lower()):
-                                matched.add(kw)
-                                break
-            except Exception:
-                pass
-        return sorted(matched)
+        return self.keyword_index.find_keywords(text, self.lemmatize)
+    
+    def find_keywords_batch(self, texts):
+        """Ищет ключевые слова в пачке текстов; каждое слово лемматизируется один раз"""
+        return self.keyword_index.find_keywords_batch(texts, self.lemmatize)
+    
+    async def match_keywords_batch(self, texts):
+        """Пакетный поиск: в пуле процессов одним заданием, иначе в event loop"""
+        with metrics.timer('find_keywords_batch'):
+            if self.matching_pool:
+                return await self.matching_pool.find_keywords_batch(texts)
+            return self.find_keywords_batch(texts)
+    
+    async def match_keywords(self, text):
+        """Ищет ключевые слова в пуле процессов, если он включен, иначе в event loop"""
+        with metrics.timer('find_keywords'):
+            if self.matching_pool:
+                return await self.matching_pool.find_keywords(text)
+            return self.find_keywords(text)
         
     def extract_telegram_username(self, text):
         """Извлекает Telegram username из текста"""
@@ -411,76 +1123,314 @@ class TelegramMonitor:
             logger.error(f"Ошибка создания кнопки контакта")
             return "[Связаться с автором]()"
             
-    async def process_found_message(self, event, group_entity, keywords=None):
-        """Обрабатывает найденное сообщение"""
+    async def process_found_message(self, event, group_entity, keywords=None, live=True):
+        """Обрабатывает найденное сообщение (live=False - найдено в истории)"""
+        reserved = None
         try:
-            # Получаем отправителя через userbot
-            sender = await event.get_sender()
-            
-            # Формируем информацию об авторе
-            author_info = "Неизвестный автор"
-            if sender:
-                if hasattr(sender, 'username') and sender.username:
-                    author_info = f"@{sender.username}"
-                elif hasattr(sender, 'first_name'):
-                    author_info = sender.first_name
-                    if hasattr(sender, 'last_name') and sender.last_name:
-                        author_info += f" {sender.last_name}"
-                        
-            # Информация о группе
-            group_name = getattr(group_entity, 'title', 'Неизвестная группа')
+            # Сообщение, прочитанное повторно после сбоя, уже есть в журнале
+            if self.outbox.has(event.chat_id, event.id):
+                metrics.inc('outbox_duplicates')
+                return
+            
+            # Кросспосты и слегка отредактированные повторы не отправляем заново.
+            # Запись индекса резервируется сразу после промаха, до первого await:
+            # параллельные обработчики и дочитывание истории находят ее и ждут,
+            # пока уведомление уйдет, а не отправляют второе
+            message_key = (event.chat_id, event.id)
+            while self.deduplicator is not None:
+                original = self.deduplicator.find(event.text)
+                if original is None:
+                    self.deduplicator.count(duplicate=False)
+                    reserved = {'ready': asyncio.get_running_loop().create_future(), 'message': message_key}
+                    reserved_id = self.deduplicator.add(event.text, reserved)
+                    break
+                if await asyncio.shield(original['ready']):
+                    if original['message'] == message_key:
+                        # То же сообщение пришло и из обработчика, и из дочитывания истории
+                        return
+                    self.deduplicator.count(duplicate=True)
+                    metrics.inc('duplicates')
+                    print(f"🔁 Найден дубликат предложения")
+                    if DEDUP_MODE == 'fold':
+                        await self.fold_duplicate(original, event, group_entity)
+                    return
+                # Уведомление о первом сообщении не ушло и его запись снята: проверяем заново
+            
+            # Получаем профиль отправителя (из кэша или через userbot)
+            with metrics.timer('get_sender'):
+                sender = await self.sender_cache.get_profile(event)
             
             # Найденные ключевые слова (используем переданные или ищем заново)
             if keywords is None:
                 keywords = self.find_keywords(event.text)
-            keywords_text = ", ".join(keywords)
-            
-            # Создаем кнопку для связи с автором
-            contact_button = await self.create_contact_button_from_event(event, sender)
-            
-            # Создаем ссылки на группу и сообщение
-            group_link = await self.create_group_link(group_entity)
-            message_link = await self.create_message_link(event, group_entity)
-            
-            # Формируем текст уведомления
-            notification_text = (
-                f"🎵 **Найдено предложение!**\n\n"
-                f"👤 **Автор:** {author_info}\n"
-                f"💬 **Группа:** {group_link}\n"
-                f"🔍 **Ключевые слова:** {keywords_text}\n"
-                f"📅 **Время:** {(event.date + timedelta(hours=3)).strftime('%d.%m.%Y %H:%M')}\n\n"
-                f"**Сообщение:**\n{event.text}\n\n"
-                f"🔗 {message_link}\n"
-                f"👆 {contact_button}"
-            )
             
-            # Отправляем уведомление через bot
+            # В режиме дайджеста предложение без срочных ключевых слов ждет окна
+            to_digest = self.digest is not None and not self.is_instant(keywords)
+            with metrics.timer('render'):
+                if to_digest:
+                    notification_text = await self.render_digest_item(event, group_entity, sender, keywords)
+                else:
+                    notification_text = await self.render_notification(event, group_entity, sender, keywords)
+            
+            if self.offer_archive is not None:
+                self.archive_offer(event, group_entity, sender, keywords)
+            
+            # Записываем уведомление в журнал для каждого маршрута и ставим
+            # в очереди отправки через bot
             if self.target_entity:
-                try:
-                    await self.bot_client.send_message(
-                        self.target_entity,
-                        notification_text,
-                        parse_mode='markdown'
-                    )
-                    print(f"✅ Уведомление отправлено")
-                    
-                except Exception as send_error:
-                    error_type = type(send_error).__name__
-                    print(f"❌ Ошибка отправки: {error_type}")
-                    
-                    if "CHAT_WRITE_FORBIDDEN" in str(send_error):
-                        print("🚫 Нет прав на запись в группу")
-                    elif "USER_BANNED_IN_CHANNEL" in str(send_error):
-                        print("🚫 Бот заблокирован в группе")
-                    elif "CHAT_ADMIN_REQUIRED" in str(send_error):
-                        print("🚫 Нужны права администратора")
+                priority = NotificationSender.PRIORITY_LIVE if live else NotificationSender.PRIORITY_BACKFILL
+                kind = NotificationOutbox.DIGEST if to_digest else NotificationOutbox.SINGLE
+                entries = []
+                for target in self.routing.route(keywords):
+                    entry_id = self.outbox.add(event.chat_id, event.id, notification_text, priority,
+                                               event.date, kind, target)
+                    if entry_id is not None:
+                        entries.append((target, entry_id))
+                if not entries:
+                    metrics.inc('outbox_duplicates')
+                    print(f"📭 Уведомление об этом сообщении уже записано в журнал")
+                    return
+                if to_digest:
+                    original = {'digest_items': [
+                        self.queue_digest_entry(entry_id, notification_text, priority, event.date, target)
+                        for target, entry_id in entries
+                    ]}
+                else:
+                    original = {
+                        'sent': [
+                            (target, self.send_outbox_entries([entry_id], notification_text, priority,
+                                                              event.date, target))
+                            for target, entry_id in entries
+                        ],
+                        'text': notification_text,
+                        'links': [],
+                        'edit_task': None,
+                    }
+                
+                if reserved is not None:
+                    reserved.update(original)
+                    reserved['ready'].set_result(True)
                     
             else:
                 print("⚠️ Целевая группа не настроена")
                 
         except Exception as e:
+            # Сообщение не записано в журнал: ошибка передается вызывающему,
+            # чтобы курсор группы не сдвинулся дальше этого сообщения
             logger.error(f"❌ Ошибка при обработке найденного сообщения: {e}")
+            raise
+        finally:
+            if reserved is not None and not reserved['ready'].done():
+                # Уведомление не ушло: дубликаты, ждущие эту запись, обработаются как новые
+                self.deduplicator.remove(reserved_id)
+                reserved['ready'].set_result(False)
+            
+    def send_outbox_entries(self, entry_ids, text, priority, message_date, target=DEFAULT_TARGET):
+        """Ставит записи журнала в очередь отправки чата маршрута одним сообщением; после доставки отмечает их"""
+        self.outbox_inflight.update(entry_ids)
+        sent = self.notification_sender.send(
+            self.target_for(target),
+            text,
+            priority=priority,
+            message_date=message_date,
+            parse_mode='markdown'
+        )
+        
+        def on_sent(future):
+            self.outbox_inflight.difference_update(entry_ids)
+            # Отмена при остановке - не ошибка: запись отправится после перезапуска
+            if future.cancelled():
+                return
+            message = None if future.exception() else future.result()
+            for entry_id in entry_ids:
+                if message is not None:
+                    self.outbox.mark_delivered(entry_id, getattr(message, 'id', None))
+                else:
+                    # Запись остается в журнале до следующей попытки
+                    self.outbox.mark_failed(entry_id)
+        
+        sent.add_done_callback(on_sent)
+        return sent
+    
+    def is_instant(self, keywords):
+        """Отправлять ли предложение сразу, минуя дайджест"""
+        return any(keyword.lower() in self.instant_keywords for keyword in keywords)
+    
+    def queue_digest_entry(self, entry_id, text, priority, message_date, target=DEFAULT_TARGET):
+        """Добавляет запись журнала в дайджест"""
+        self.outbox_inflight.add(entry_id)
+        return self.digest.add(DigestItem(entry_id, text, priority, message_date, target))
+    
+    def send_digest(self, items):
+        """Отправляет накопленные предложения отдельным дайджестом в чат каждого маршрута;
+        длинный дайджест делится на несколько сообщений"""
+        by_target = {}
+        for item in items:
+            by_target.setdefault(item.target, []).append(item)
+        
+        for target, target_items in by_target.items():
+            def header(part, total):
+                title = f"📋 **Дайджест: найдено предложений - {len(target_items)}**"
+                return title if total == 1 else f"{title} ({part}/{total})"
             
+            texts = [item.render() for item in target_items]
+            for indexes, text in split_digest(texts, MAX_MESSAGE_LENGTH, header):
+                chunk = [target_items[index] for index in indexes]
+                dates = [item.message_date for item in chunk if item.message_date is not None]
+                self.send_outbox_entries(
+                    [item.entry_id for item in chunk],
+                    text,
+                    min(item.priority for item in chunk),
+                    min(dates) if dates else None,
+                    target,
+                )
+        print(f"📋 Отправлен дайджест: {len(items)} предложений")
+    
+    async def resume_outbox(self):
+        """Отправляет недоставленные записи журнала (кроме уже стоящих в очереди)"""
+        if not self.target_entity:
+            return 0
+        entries = self.outbox.pending(exclude=self.outbox_inflight)
+        for entry in entries:
+            if entry.kind == NotificationOutbox.DIGEST and self.digest is not None:
+                self.queue_digest_entry(entry.id, entry.text, entry.priority, entry.message_date, entry.target)
+            else:
+                self.send_outbox_entries([entry.id], entry.text, entry.priority, entry.message_date, entry.target)
+        if entries:
+            print(f"📬 Повторная отправка {len(entries)} уведомлений из журнала")
+        return len(entries)
+    
+    def start_outbox_retry(self):
+        """Периодически повторяет отправку недоставленных уведомлений"""
+        if OUTBOX_RETRY_INTERVAL <= 0 or self.outbox_task is not None:
+            return
+        
+        async def retry_loop():
+            while True:
+                await asyncio.sleep(OUTBOX_RETRY_INTERVAL)
+                try:
+                    await self.resume_outbox()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка повторной отправки уведомлений: {e}")
+        
+        self.outbox_task = asyncio.get_running_loop().create_task(retry_loop())
+    
+    async def fold_duplicate(self, original, event, group_entity):
+        """Добавляет ссылку на дубликат в ранее отправленное уведомление.
+        
+        Правки копятся DEDUP_FOLD_DELAY секунд и применяются одним редактированием.
+        """
+        if 'digest_items' in original:
+            # Предложение еще ждет дайджеста: ссылка попадет в него же; в уже
+            # отправленный дайджест она не дописывается - дубликат пропускается
+            items = [item for item in original['digest_items'] if self.digest.pending(item)]
+            if not items:
+                metrics.inc('dedup_fold_missed')
+                print(f"♻️ Дайджест с оригиналом уже отправлен: дубликат пропущен")
+                return
+            url = self.message_url(event.id, group_entity)
+            title = getattr(group_entity, 'title', 'Группа')
+            for item in items:
+                item.links.append(f"[{title}]({url})" if url else title)
+            return
+        
+        group_link = await self.create_group_link(group_entity)
+        message_link = await self.create_message_link(event, group_entity)
+        original['links'].append(f"{group_link} — {message_link}")
+        
+        if original['edit_task'] is None:
+            original['edit_task'] = asyncio.create_task(self.apply_folded_links(original))
+    
+    async def apply_folded_links(self, original):
+        """Редактирует уведомление, дописывая ссылки на дубликаты"""
+        await asyncio.sleep(DEDUP_FOLD_DELAY)
+        original['edit_task'] = None
+        
+        links = original['links']
+        shown = links[:MAX_FOLDED_LINKS]
+        text = original['text'] + "\n\n🔁 **Также опубликовано:**\n" + "\n".join(f"• {link}" for link in shown)
+        if len(links) > len(shown):
+            text += f"\n• и еще {len(links) - len(shown)}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return
+        
+        # Уведомление правится в каждом чате маршрута, куда оно ушло
+        for target, sent in original['sent']:
+            message = await sent
+            if message is not None:
+                self.notification_sender.edit(self.target_for(target), message.id, text, parse_mode='markdown')
+    
+    def archive_offer(self, event, group_entity, sender, keywords):
+        """Сохраняет найденное предложение в архив для последующего поиска"""
+        route = self.chat_routes.get(event.chat_id)
+        with metrics.timer('archive'):
+            self.offer_archive.add(
+                event.chat_id,
+                event.id,
+                event.text,
+                keywords,
+                group_url=route[0] if route else None,
+                group_name=getattr(group_entity, 'title', None),
+                author=self.format_author(sender) if sender else None,
+                message_date=event.date,
+                link=self.message_url(event.id, group_entity),
+            )
+    
+    async def render_digest_item(self, event, group_entity, sender, keywords):
+        """Формирует краткую запись о найденном сообщении для дайджеста"""
+        text = (event.text or '').strip()
+        if len(text) > DIGEST_EXCERPT_LENGTH:
+            text = text[:DIGEST_EXCERPT_LENGTH].rstrip() + '…'
+        
+        contact_button = await self.create_contact_button_from_event(event, sender)
+        group_link = await self.create_group_link(group_entity)
+        message_link = await self.create_message_link(event, group_entity)
+        
+        return (
+            f"🔍 **{', '.join(keywords)}** · 💬 {group_link} · 👤 {self.format_author(sender)}\n"
+            f"{text}\n"
+            f"🔗 {message_link} · 👆 {contact_button}"
+        )
+    
+    def format_author(self, sender):
+        """Имя автора для уведомления: @username или имя и фамилия"""
+        author_info = "Неизвестный автор"
+        if sender:
+            if sender.username:
+                author_info = f"@{sender.username}"
+            elif sender.first_name:
+                author_info = sender.first_name
+                if sender.last_name:
+                    author_info += f" {sender.last_name}"
+        return author_info
+    
+    async def render_notification(self, event, group_entity, sender, keywords):
+        """Формирует текст уведомления о найденном сообщении"""
+        # Формируем информацию об авторе
+        author_info = self.format_author(sender)
+                    
+        keywords_text = ", ".join(keywords)
+        
+        # Создаем кнопку для связи с автором
+        contact_button = await self.create_contact_button_from_event(event, sender)
+        
+        # Создаем ссылки на группу и сообщение
+        group_link = await self.create_group_link(group_entity)
+        message_link = await self.create_message_link(event, group_entity)
+        
+        # Формируем текст уведомления
+        notification_text = (
+            f"🎵 **Найдено предложение!**\n\n"
+            f"👤 **Автор:** {author_info}\n"
+            f"💬 **Группа:** {group_link}\n"
+            f"🔍 **Ключевые слова:** {keywords_text}\n"
+            f"📅 **Время:** {(event.date + timedelta(hours=3)).strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"**Сообщение:**\n{event.text}\n\n"
+            f"🔗 {message_link}\n"
+            f"👆 {contact_button}"
+        )
+        return notification_text
+    
     async def create_group_link(self, group_entity):
         """Создает ссылку на группу"""
         try:
@@ -504,24 +1454,28 @@ class TelegramMonitor:
             logger.error(f"Ошибка создания ссылки на группу")
             return getattr(group_entity, 'title', 'Группа')
             
+    def message_url(self, message_id, group_entity):
+        """URL сообщения в группе; None, если у группы нет публичной ссылки"""
+        # Если у группы есть username (публичная)
+        if hasattr(group_entity, 'username') and group_entity.username:
+            return f"https://t.me/{group_entity.username}/{message_id}"
+        # Для приватных групп
+        chat_id = str(group_entity.id)
+        if chat_id.startswith('-100'):
+            # Убираем префикс -100 для создания ссылки
+            clean_id = chat_id[4:]
+            return f"https://t.me/c/{clean_id}/{message_id}"
+        return None
+            
     async def create_message_link(self, event, group_entity):
         """Создает ссылку на конкретное сообщение"""
         try:
-            message_id = event.id
-            
-            # Если у группы есть username (публичная)
-            if hasattr(group_entity, 'username') and group_entity.username:
-                return f"[Перейти к сообщению](https://t.me/{group_entity.username}/{message_id})"
+            url = self.message_url(event.id, group_entity)
+            if url:
+                return f"[Перейти к сообщению]({url})"
             else:
-                # Для приватных групп
-                chat_id = str(group_entity.id)
-                if chat_id.startswith('-100'):
-                    # Убираем префикс -100 для создания ссылки
-                    clean_id = chat_id[4:]
-                    return f"[Перейти к сообщению](https://t.me/c/{clean_id}/{message_id})"
-                else:
-                    print("[Ссылка недоступна для приватной группы]")
-                    return "[Ссылка недоступна для приватной группы]"
+                print("[Ссылка недоступна для приватной группы]")
+                return "[Ссылка недоступна для приватной группы]"
                     
         except Exception as e:
             logger.error(f"Ошибка создания ссылки на сообщение")
@@ -535,18 +1489,19 @@ class TelegramMonitor:
             print("🔍 Гибридный мониторинг запущен!")
             print("👤 Userbot - мониторинг групп от вашего имени")
             print("🤖 Bot - отправка уведомлений в целевую группу")
-            print(f"📝 Отслеживаем {len(KEYWORDS)} ключевых слов")
+            print(f"📝 Отслеживаем {len(self.keywords)} ключевых слов")
             print("📡 Используем события для реального времени")
             print("⚡ Быстрая обработка без задержек")
             
             # Показываем статистику базы данных
+            await self.message_time_manager.flush_async()
             stats = self.message_time_manager.get_statistics()
             print(f"💾 База данных: {stats['total_groups']} групп, {stats['active_today']} активных сегодня")
             
             print("⏹️  Нажмите Ctrl+C для остановки")
             
             # Запускаем бесконечный цикл для обработки событий
-            await self.user_client.run_until_disconnected()
+            await asyncio.gather(*(shard.run_until_disconnected() for shard in self.shards))
             
         except KeyboardInterrupt:
             logger.info("⏹️ Получен сигнал остановки")
@@ -554,8 +1509,33 @@ class TelegramMonitor:
             error_type = type(e).__name__
             logger.error(f"❌ Критическая ошибка: {error_type}")
         finally:
-            await self.user_client.disconnect()
+            await self.stop_config_watch()
+            if self.watchdog_task is not None:
+                self.watchdog_task.cancel()
+            self.profiler.stop()
+            # Дорабатываем принятые сообщения, пока пул поиска и отправка работают
+            await self.ingest_queue.stop()
+            await self.metrics_exporter.stop()
+            if self.matching_pool:
+                self.matching_pool.shutdown()
+            if self.outbox_task is not None:
+                self.outbox_task.cancel()
+            if self.digest is not None:
+                self.digest.flush()
+            await self.notification_sender.stop()
+            if self.update_state_task is not None:
+                self.update_state_task.cancel()
+            if GAP_RECOVERY:
+                self.save_sessions()
+            self.outbox.close()
+            if self.offer_archive is not None:
+                self.offer_archive.close()
+            await self.message_time_manager.close()
+            for shard in self.shards:
+                await shard.client.disconnect()
             await self.bot_client.disconnect()
+            self.log_cache_stats()
+            self.lemma_cache.save(self.data_dir)
             logger.info("✅ Система остановлена")
 
 async def main():
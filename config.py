@@ -1,5 +1,9 @@
 import os
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
+
+# Переменные окружения процесса (до чтения .env): они важнее значений из файлов
+# и при запуске, и при перезагрузке конфигурации
+PROCESS_ENV_KEYS = frozenset(os.environ)
 
 # Загружаем .env файл только если он существует (для локальной разработки)
 # На хостинге используются системные переменные окружения
@@ -24,21 +28,150 @@ SESSION_NAME = os.getenv('SESSION_NAME', 'offer_search_bot')
 
 LOG_LEVEL = int(os.getenv('LOG_LEVEL', 0))
 
+# Максимальный размер кэша нормальных форм слов (pymorphy3)
+LEMMA_CACHE_SIZE = int(os.getenv('LEMMA_CACHE_SIZE', 50000))
+
+# Интервал сброса времен последних сообщений в базу (секунды, 0 - писать сразу)
+CURSOR_FLUSH_INTERVAL = float(os.getenv('CURSOR_FLUSH_INTERVAL', 5))
+
+# Сколько групп одной сессии дочитывается одновременно (при запуске и в фоне)
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 5))
+# Сколько сообщений истории проверяется на ключевые слова одной пачкой
+BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 100))
+
+# Очередь входящих сообщений: число обработчиков, емкость и политика
+# при заполнении (block - ждать, drop_newest / drop_oldest - отбрасывать)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 4))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 1000))
+INGEST_QUEUE_POLICY = os.getenv('INGEST_QUEUE_POLICY', 'block').lower()
+
+# Бюджет отправки уведомлений в один чат (Telegram: до 20 сообщений в минуту в группу)
+SEND_RATE_PER_MINUTE = float(os.getenv('SEND_RATE_PER_MINUTE', 20))
+SEND_BURST = int(os.getenv('SEND_BURST', 3))
+
+# Сколько новых групп одновременно разрешается при запуске
+RESOLVE_CONCURRENCY = int(os.getenv('RESOLVE_CONCURRENCY', 5))
+
+# Кэш профилей авторов: размер и время жизни записи (секунды)
+SENDER_CACHE_SIZE = int(os.getenv('SENDER_CACHE_SIZE', 10000))
+SENDER_CACHE_TTL = float(os.getenv('SENDER_CACHE_TTL', 3600))
+
+# Поиск ключевых слов в пуле процессов (0 - в основном процессе)
+MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', 0))
+MATCH_BATCH_SIZE = int(os.getenv('MATCH_BATCH_SIZE', 64))
+
+# Метрики: порт HTTP на 127.0.0.1 (0 - выключено), файл в директории данных и период его записи
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', 60))
+
+# Дубликаты предложений: off - отправлять все, suppress - пропускать,
+# fold - дописывать ссылку в ранее отправленное уведомление
+DEDUP_MODE = os.getenv('DEDUP_MODE', 'off').lower()
+DEDUP_WINDOW_HOURS = float(os.getenv('DEDUP_WINDOW_HOURS', 24))
+DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', 5000))
+DEDUP_FOLD_DELAY = float(os.getenv('DEDUP_FOLD_DELAY', 30))
+
+# Журнал уведомлений: период повторной отправки недоставленных (секунды)
+# и сколько дней хранить доставленные записи
+OUTBOX_RETRY_INTERVAL = float(os.getenv('OUTBOX_RETRY_INTERVAL', 60))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))
+
+# Архив найденных предложений с полнотекстовым поиском (offers_cli.py)
+OFFER_ARCHIVE = os.getenv('OFFER_ARCHIVE', 'true').lower() in ('1', 'true', 'yes')
+
+# Восстановление пропусков: клиенты userbot подключаются с catch_up и после
+# перезапуска догружают разницу обновлений по состоянию из сессии Telethon
+# вместо чтения истории; период сохранения сессий на диск (секунды) и скачок
+# id сообщений канала, после которого его история дочитывается заново
+GAP_RECOVERY = os.getenv('GAP_RECOVERY', 'true').lower() in ('1', 'true', 'yes')
+UPDATE_STATE_INTERVAL = float(os.getenv('UPDATE_STATE_INTERVAL', 30))
+GAP_MIN_MESSAGES = int(os.getenv('GAP_MIN_MESSAGES', 20))
+
+# Сторож потока событий: период проверки (секунды, 0 - выключен), во сколько
+# обычных интервалов между сообщениями группы тишина считается остановкой,
+# минимальная тишина (секунды), сколько групп сессии должны замолчать, чтобы
+# сессия переподключилась, и минимальный период между переподключениями (секунды)
+WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', 60))
+WATCHDOG_STALL_FACTOR = float(os.getenv('WATCHDOG_STALL_FACTOR', 5))
+WATCHDOG_MIN_SILENCE = float(os.getenv('WATCHDOG_MIN_SILENCE', 600))
+WATCHDOG_MIN_STALLED_GROUPS = int(os.getenv('WATCHDOG_MIN_STALLED_GROUPS', 3))
+WATCHDOG_RECONNECT_INTERVAL = float(os.getenv('WATCHDOG_RECONNECT_INTERVAL', 1800))
+
+# Сэмплирующий профайлер обработки сообщений: включен с запуска (переключается
+# сигналом SIGUSR2), шаг сэмплирования (миллисекунды) и период записи профиля
+# в data/profiles (секунды)
+PROFILING = os.getenv('PROFILING', 'false').lower() in ('1', 'true', 'yes')
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', 10))
+PROFILING_FLUSH_INTERVAL = float(os.getenv('PROFILING_FLUSH_INTERVAL', 60))
+
+# Дайджест: окно накопления найденных предложений (секунды, 0 - отправлять
+# каждое сразу), сколько предложений отправлять не дожидаясь окна и ключевые
+# слова, предложения с которыми отправляются сразу
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+DIGEST_MAX_ITEMS = int(os.getenv('DIGEST_MAX_ITEMS', 20))
+DIGEST_INSTANT_KEYWORDS = [kw.strip() for kw in os.getenv('DIGEST_INSTANT_KEYWORDS', '').split(',') if kw.strip()]
+
+# Маршруты уведомлений по ключевым словам: "чат=слово,слово;чат=слово"
+# (чат - ID или @username); сообщения без маршрута идут в TARGET_GROUP.
+# У каждого чата своя очередь и бюджет отправки
+ROUTES_SPEC = os.getenv('ROUTES', '')
+
+# Шардирование групп по нескольким аккаунтам userbot: имена сессий через запятую
+# (пусто - одна сессия SESSION_NAME); группа закрепляется за сессией по crc32 URL
+SHARD_SESSIONS = [name.strip() for name in os.getenv('SHARD_SESSIONS', '').split(',') if name.strip()]
+
+# Горячая перезагрузка KEYWORDS и GROUPS_TO_MONITOR: файл в формате .env,
+# изменения которого отслеживаются (пусто - перечитывается .env по SIGHUP),
+# и период проверки файла (секунды)
+CONFIG_RELOAD_FILE = os.getenv('CONFIG_RELOAD_FILE', '')
+CONFIG_RELOAD_INTERVAL = float(os.getenv('CONFIG_RELOAD_INTERVAL', 5))
+
+
+def parse_list(value):
+    """Разбирает список через запятую"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
 
 # Группы для мониторинга (через переменные окружения)
 def get_groups_from_env():
     """Получает список групп из переменных окружения"""
-    groups_str = os.getenv('GROUPS_TO_MONITOR', '')
-    return [group.strip() for group in groups_str.split(',') if group.strip()]
+    return parse_list(os.getenv('GROUPS_TO_MONITOR', ''))
 
 
 # Ключевые слова для поиска (через переменные окружения)
 def get_keywords_from_env():
     """Получает список ключевых слов из переменных окружения"""
-    keywords_str = os.getenv('KEYWORDS', '')
-    return [keyword.strip() for keyword in keywords_str.split(',') if keyword.strip()]
-    
+    return parse_list(os.getenv('KEYWORDS', ''))
+
+
+def parse_routes(value):
+    """Разбирает ROUTES в список (чат, [ключевые слова])"""
+    routes = []
+    for rule in (value or '').split(';'):
+        target, _, keywords = rule.partition('=')
+        if target.strip() and parse_list(keywords):
+            routes.append((target.strip(), parse_list(keywords)))
+    return routes
+
+
+def read_reloadable_config(path):
+    """Перечитывает (группы, ключевые слова) из файла формата .env.
+
+    Приоритет тот же, что у load_dotenv() при запуске: переменная окружения
+    процесса важнее файла. Ключи, которых нет в файле, берутся из окружения.
+    """
+    values = dotenv_values(path) if path and os.path.exists(path) else {}
+
+    def read(key):
+        if key in PROCESS_ENV_KEYS or values.get(key) is None:
+            return parse_list(os.getenv(key, ''))
+        return parse_list(values[key])
+
+    return read('GROUPS_TO_MONITOR'), read('KEYWORDS')
+
 
 # Получаем конфигурацию
-GROUPS_TO_MONITOR = get_groups_from_env()
-KEYWORDS = get_keywords_from_env()
\ No newline at end of file
+# (тем же способом, что и при перезагрузке, чтобы SIGHUP не менял их смысл)
+GROUPS_TO_MONITOR, KEYWORDS = read_reloadable_config(CONFIG_RELOAD_FILE or '.env')
+ROUTES = parse_routes(ROUTES_SPEC)
\ No newline at end of file
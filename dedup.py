@@ -0,0 +1,169 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+# Нормализация: без ссылок, эмодзи и пунктуации, в нижнем регистре
+_URL_RE = re.compile(r'https?://\S+|t\.me/\S+')
+_CLEAN_RE = re.compile(r'[^а-яёa-z0-9@_\s]')
+
+# MinHash: 32 хэш-функции, 16 полос по 2 строки
+NUM_HASHES = 32
+ROWS = 2
+BANDS = NUM_HASHES // ROWS
+_MASK64 = (1 << 64) - 1
+_SEEDS = [int.from_bytes(hashlib.blake2b(str(i).encode(), digest_size=8).digest(), 'big')
+          for i in range(NUM_HASHES)]
+
+
+def normalize_text(text: str) -> List[str]:
+    """Слова текста после нормализации"""
+    if not text:
+        return []
+    text = _URL_RE.sub(' ', text.lower())
+    return _CLEAN_RE.sub(' ', text).split()
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(tokens: List[str], size: int = 2) -> Set[int]:
+    """Хэши словесных шинглов (пар соседних слов)"""
+    count = max(1, len(tokens) - size + 1)
+    return {_hash64(' '.join(tokens[i:i + size])) for i in range(count)}
+
+
+def minhash(shingle_set: Set[int]) -> List[int]:
+    """MinHash-сигнатура: вероятность совпадения позиции равна сходству Жаккара"""
+    return [
+        min(((h ^ seed) * 0x9E3779B97F4A7C15) & _MASK64 for h in shingle_set)
+        for seed in _SEEDS
+    ]
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Entry:
+    __slots__ = ('exact', 'shingles', 'bands', 'created_at', 'payload')
+
+    def __init__(self, exact: str, shingle_set: Optional[Set[int]], bands: List[int],
+                 created_at: float, payload: Any):
+        self.exact = exact
+        self.shingles = shingle_set
+        self.bands = bands
+        self.created_at = created_at
+        self.payload = payload
+
+
+class OfferDeduplicator:
+    """Скользящий индекс недавних найденных предложений.
+
+    Точные копии находятся по хэшу нормализованного текста, слегка
+    отредактированные — через шинглы пар слов: MinHash-сигнатура делится
+    на полосы (LSH), кандидаты из совпавших полос проверяются точным
+    сходством Жаккара. Память ограничена числом записей и окном по времени.
+    """
+
+    def __init__(self, max_entries: int = 5000, window: float = 24 * 3600,
+                 threshold: float = 0.6, min_tokens: int = 6):
+        self.max_entries = max_entries
+        self.window = window
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._exact: Dict[str, int] = {}
+        self._bands: List[Dict[int, set]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+        self.checked = 0
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.created_at <= self.window:
+                break
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        if self._exact.get(entry.exact) == entry_id:
+            del self._exact[entry.exact]
+        for band, key in enumerate(entry.bands):
+            ids = self._bands[band].get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._bands[band][key]
+
+    def _fingerprints(self, text: str):
+        tokens = normalize_text(text)
+        exact = hashlib.blake2b(' '.join(tokens).encode('utf-8'), digest_size=16).hexdigest()
+        # Короткие тексты сравниваем только точно: шинглов слишком мало
+        if len(tokens) < self.min_tokens:
+            return exact, None, []
+        shingle_set = shingles(tokens)
+        signature = minhash(shingle_set)
+        bands = [hash(tuple(signature[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+        return exact, shingle_set, bands
+
+    def find(self, text: str) -> Optional[Any]:
+        """Возвращает данные более раннего дубликата или None (статистику ведет count)"""
+        now = time.monotonic()
+        self._evict(now)
+
+        exact, shingle_set, bands = self._fingerprints(text)
+        entry_id = self._exact.get(exact)
+        if entry_id is None and shingle_set is not None:
+            candidates = set()
+            for band, key in enumerate(bands):
+                candidates.update(self._bands[band].get(key, ()))
+            best = 0.0
+            for candidate in candidates:
+                similarity = jaccard(shingle_set, self._entries[candidate].shingles)
+                if similarity >= self.threshold and similarity > best:
+                    entry_id, best = candidate, similarity
+
+        if entry_id is None:
+            return None
+        return self._entries[entry_id].payload
+
+    def count(self, duplicate: bool):
+        """Учитывает проверенное предложение; find может повторяться для одного сообщения"""
+        self.checked += 1
+        if duplicate:
+            self.duplicates += 1
+
+    def add(self, text: str, payload: Any) -> int:
+        """Запоминает отправленное предложение; возвращает номер записи для remove"""
+        now = time.monotonic()
+        exact, shingle_set, bands = self._fingerprints(text)
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = _Entry(exact, shingle_set, bands, now, payload)
+        self._exact[exact] = entry_id
+        for band, key in enumerate(bands):
+            self._bands[band].setdefault(key, set()).add(entry_id)
+        self._evict(now)
+        return entry_id
+
+    def remove(self, entry_id: int):
+        """Забывает запись (например, если уведомление так и не ушло)"""
+        if entry_id in self._entries:
+            self._remove(entry_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DigestItem:
+    """Найденное предложение, ожидающее отправки в дайджесте"""
+
+    __slots__ = ('entry_id', 'text', 'priority', 'message_date', 'target', 'links')
+
+    def __init__(self, entry_id: int, text: str, priority: int, message_date: Optional[datetime],
+                 target: str = ''):
+        self.entry_id = entry_id
+        self.text = text
+        self.priority = priority
+        self.message_date = message_date
+        self.target = target  # Целевой чат маршрута ('' - TARGET_GROUP)
+        self.links: List[str] = []  # Ссылки на дубликаты, найденные до отправки
+
+    def render(self) -> str:
+        if not self.links:
+            return self.text
+        return self.text + "\n🔁 Также: " + ", ".join(self.links)
+
+
+def split_digest(texts: List[str], max_length: int,
+                 header: Callable[[int, int], str]) -> List[Tuple[List[int], str]]:
+    """Собирает тексты в сообщения не длиннее max_length.
+
+    header(часть, всего) - заголовок каждого сообщения (место под него
+    резервируется по заголовку для 99 частей). Текст, который не помещается
+    в сообщение целиком, обрезается. Возвращает [(номера текстов, сообщение)].
+    """
+    budget = max_length - len(header(99, 99)) - 2
+    texts = [text if len(text) <= budget else text[:budget - 1] + '…' for text in texts]
+    groups: List[List[int]] = []
+    length = 0
+    for index, text in enumerate(texts):
+        size = len(text) + 2  # Пустая строка между предложениями
+        if not groups or length + size > budget + 2:
+            groups.append([])
+            length = 0
+        groups[-1].append(index)
+        length += size
+    return [
+        (indexes, header(part, len(groups)) + "\n\n" + "\n\n".join(texts[i] for i in indexes))
+        for part, indexes in enumerate(groups, 1)
+    ]
+
+
+class NotificationDigest:
+    """Сборщик найденных предложений в периодические дайджесты.
+
+    Первое предложение запускает окно window секунд; по его окончании или
+    при накоплении max_items предложений буфер передается в on_flush одним
+    списком. Отправку и разбиение на сообщения выполняет вызывающий код.
+    """
+
+    def __init__(self, on_flush: Callable[[List[DigestItem]], None], window: float = 300,
+                 max_items: int = 20):
+        self.on_flush = on_flush
+        self.window = window
+        self.max_items = max(1, max_items)
+        self._items: List[DigestItem] = []
+        self._timer: Optional[asyncio.Task] = None
+        self.flushed_items = 0
+        self.flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def pending(self, item: DigestItem) -> bool:
+        """Ждет ли предложение отправки (еще не передано в on_flush)"""
+        return any(buffered is item for buffered in self._items)
+
+    def add(self, item: DigestItem) -> DigestItem:
+        self._items.append(item)
+        if len(self._items) >= self.max_items:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._wait_window())
+        return item
+
+    async def _wait_window(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Передает накопленные предложения в on_flush"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if not items:
+            return
+        self.flushes += 1
+        self.flushed_items += len(items)
+        try:
+            self.on_flush(items)
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки дайджеста: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'buffered': len(self._items),
+            'flushes': self.flushes,
+            'items': self.flushed_items,
+        }
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+from telethon import types, utils
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEntity:
+    """Сохраненные данные группы, достаточные для работы без запросов к Telegram.
+
+    Telethon принимает объект везде, где ожидается сущность, через
+    атрибут input_entity.
+    """
+
+    __slots__ = ('id', 'access_hash', 'kind', 'title', 'username')
+
+    def __init__(self, id: int, access_hash: Optional[int], kind: str,
+                 title: Optional[str] = None, username: Optional[str] = None):
+        self.id = id
+        self.access_hash = access_hash
+        self.kind = kind
+        self.title = title
+        self.username = username
+
+    @classmethod
+    def from_entity(cls, entity) -> Optional['CachedEntity']:
+        """Создает запись из сущности Telethon (None, если тип не поддерживается)"""
+        if isinstance(entity, cls):
+            return entity
+        if isinstance(entity, types.Channel):
+            kind = 'channel'
+        elif isinstance(entity, types.Chat):
+            kind = 'chat'
+        elif isinstance(entity, types.User):
+            kind = 'user'
+        else:
+            return None
+        title = getattr(entity, 'title', None) or getattr(entity, 'first_name', None)
+        return cls(entity.id, getattr(entity, 'access_hash', None), kind,
+                   title, getattr(entity, 'username', None))
+
+    @property
+    def input_entity(self):
+        if self.kind == 'channel':
+            return types.InputPeerChannel(self.id, self.access_hash or 0)
+        if self.kind == 'chat':
+            return types.InputPeerChat(self.id)
+        return types.InputPeerUser(self.id, self.access_hash or 0)
+
+    @property
+    def peer_id(self) -> int:
+        """Идентификатор чата в формате event.chat_id"""
+        return utils.get_peer_id(self.input_entity)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CachedEntity':
+        return cls(data['id'], data.get('access_hash'), data['kind'],
+                   data.get('title'), data.get('username'))
+
+
+class EntityCache:
+    """Кэш разрешенных URL групп в файле директории данных"""
+
+    def __init__(self, data_dir: str, file_name: str = 'entities.json'):
+        self.path = os.path.join(data_dir, file_name)
+        self._entities: Dict[str, CachedEntity] = {}
+
+    def load(self) -> int:
+        """Загружает кэш с диска; возвращает число записей"""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entities = {url: CachedEntity.from_dict(item) for url, item in data.items()}
+            logger.info(f"📥 Загружено {len(self._entities)} сохраненных групп")
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки кэша групп: {e}")
+            self._entities = {}
+        return len(self._entities)
+
+    def save(self):
+        """Атомарно сохраняет кэш на диск"""
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({url: entity.to_dict() for url, entity in self._entities.items()},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения кэша групп: {e}")
+
+    def get(self, url: str) -> Optional[CachedEntity]:
+        return self._entities.get(url)
+
+    def put(self, url: str, entity) -> Optional[CachedEntity]:
+        """Запоминает сущность для URL"""
+        cached = CachedEntity.from_entity(entity)
+        if cached is not None:
+            self._entities[url] = cached
+        return cached
+
+    def retain(self, urls: Iterable[str]):
+        """Удаляет записи для URL, которые больше не отслеживаются"""
+        keep = set(urls)
+        for url in list(self._entities):
+            if url not in keep:
+                del self._entities[url]
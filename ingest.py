@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CursorTracker:
+    """Порядок сохранения курсоров групп при параллельной обработке.
+
+    Сообщения одной группы обрабатываются разными обработчиками и
+    завершаются в произвольном порядке. Курсор группы сдвигается на
+    сообщение, только когда обработаны все более ранние сообщения этой
+    группы из очереди, иначе после сбоя они были бы потеряны. Сообщение,
+    которое не удалось обработать, остается незавершенным (или отмечается
+    hold): курсор не сдвигается дальше него, и после перезапуска оно будет
+    прочитано снова.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Any, set] = {}
+        self._done: Dict[Any, Tuple[int, Any]] = {}  # группа -> (id, данные) последнего обработанного
+
+    def begin(self, key, message_id: int):
+        self._inflight.setdefault(key, set()).add(message_id)
+
+    def hold(self, key, message_id: int):
+        """Не сдвигать курсор группы дальше сообщения, которое не удалось обработать"""
+        self.begin(key, message_id)
+
+    def finish(self, key, message_id: int, payload: Any = None) -> Optional[Any]:
+        """Отмечает сообщение завершенным (payload=None - без сдвига курсора на него).
+
+        Возвращает данные сообщения, на которое можно сдвинуть курсор, или None.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            inflight.discard(message_id)
+
+        done = self._done.get(key)
+        if payload is not None and (done is None or message_id > done[0]):
+            done = (message_id, payload)
+        if done is None:
+            return None
+        if inflight and min(inflight) < done[0]:
+            self._done[key] = done
+            return None
+
+        self._done.pop(key, None)
+        if not inflight:
+            self._inflight.pop(key, None)
+        return done[1]
+
+    def forget(self, key):
+        self._inflight.pop(key, None)
+        self._done.pop(key, None)
+
+
+class IngestQueue:
+    """Ограниченная очередь входящих сообщений перед пулом обработчиков.
+
+    Обработчик событий Telethon только кладет сообщение в очередь, поиск
+    ключевых слов, профили авторов и отправка выполняются workers
+    обработчиками. При заполненной очереди действует политика:
+    block - обработчик событий ждет места (Telethon копит обновления),
+    drop_newest - новое сообщение отбрасывается, drop_oldest - вытесняется
+    самое старое из очереди.
+    """
+
+    BLOCK = 'block'
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    POLICIES = (BLOCK, DROP_NEWEST, DROP_OLDEST)
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = 4,
+                 maxsize: int = 1000, policy: str = BLOCK):
+        if policy not in self.POLICIES:
+            logger.warning(f"⚠️ Неизвестная политика очереди {policy}, используется {self.BLOCK}")
+            policy = self.BLOCK
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self.busy = 0
+        self.max_depth = 0
+        self.enqueued = 0
+        self.dropped = 0
+        self.blocked = 0
+
+    def start(self):
+        """Запускает обработчиков очереди"""
+        if not self._worker_tasks:
+            self._queue = asyncio.Queue(self.maxsize)
+            loop = asyncio.get_running_loop()
+            self._worker_tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        """Число сообщений в очереди"""
+        return self._queue.qsize() if self._queue else 0
+
+    async def put(self, item) -> Optional[Any]:
+        """Ставит сообщение в очередь; возвращает отброшенное политикой сообщение или None"""
+        self.start()
+        dropped = None
+        if self._queue.full():
+            if self.policy == self.DROP_NEWEST:
+                self.dropped += 1
+                return item
+            if self.policy == self.DROP_OLDEST:
+                _, dropped = self._queue.get_nowait()
+                self._queue.task_done()
+                self.dropped += 1
+            else:
+                self.blocked += 1
+        await self._queue.put((time.perf_counter(), item))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return dropped
+
+    def stats(self) -> Dict[str, int]:
+        """Состояние очереди входящих сообщений"""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'capacity': self.maxsize,
+            'workers': self.workers,
+            'busy': self.busy,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'blocked': self.blocked,
+        }
+
+    async def _worker(self):
+        while True:
+            enqueued_at, item = await self._queue.get()
+            metrics.observe('ingest_wait', (time.perf_counter() - enqueued_at) * 1000)
+            self.busy += 1
+            try:
+                await self.handler(item)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки входящего сообщения: {type(e).__name__}")
+            finally:
+                self.busy -= 1
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 30):
+        """Дожидается обработки очереди (не дольше timeout) и останавливает обработчиков"""
+        if not self._worker_tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не обработано входящих сообщений: {self.depth}")
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
@@ -0,0 +1,345 @@
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Очистка текста: оставляем только буквы, дефисы внутри слов, пробелы
+_CLEAN_RE = re.compile(r'[^а-яёa-z0-9\s\-]')
+
+# Разделители слов внутри ключевой фразы ("для дет", "кавер-бэнд")
+_PHRASE_SPLIT_RE = re.compile(r'[\s\-]+')
+
+# Окончания, которыми расширяется каждое ключевое слово
+ENDINGS = [
+    '', 'а', 'ы', 'и', 'у', 'е', 'ой', 'ом', 'я', 'ей', 'ых', 'ый', 'ь', 'ка', 'ки', 'ку', 'кой',
+    'цы', 'ц', 'ца', 'ец', 'ок', 'ик', 'ист', 'истка', 'истки', 'щик', 'щица', 'нщик', 'нщица', 'ант', 'антка',
+    'льную', 'льная', 'льный', 'нт', 'нтка', 'ьный'
+]
+
+
+def expand_keyword(keyword: str) -> Set[str]:
+    """Возвращает множество словоформ ключевого слова"""
+    forms = set()
+    keyword = keyword.lower()
+    forms.add(keyword)
+
+    for end in ENDINGS:
+        form = keyword + end
+        if len(form) <= len(keyword) + 5:
+            forms.add(form)
+    return forms
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на нормализованные слова (нижний регистр, без пунктуации)"""
+    if not text:
+        return []
+    words = []
+    for word in _CLEAN_RE.sub(' ', text.lower()).split():
+        word = word.strip('-')
+        if len(word) >= 2:
+            words.append(word)
+    return words
+
+
+def split_phrase(keyword: str) -> List[str]:
+    """Слова ключевой фразы; для обычного ключевого слова — одно слово"""
+    return [word for word in _PHRASE_SPLIT_RE.split(keyword.lower()) if word]
+
+
+def _safe_lemmatize(lemmatize: Callable[[str], Optional[str]], word: str) -> Optional[str]:
+    try:
+        return lemmatize(word)
+    except Exception:
+        return None
+
+
+class PhraseMatcher:
+    """Поиск ключевых фраз автоматом Ахо — Корасик по словам.
+
+    Алфавит автомата — слова фраз: слово текста становится символом,
+    если оно или его нормальная форма входит в словоформы слова фразы
+    (как в expand_keyword). Текст проходится один раз, поэтому время
+    поиска линейно по числу слов и не зависит от числа фраз.
+
+    Нормальная форма запрашивается только у слов, начинающихся с тех же
+    двух букв, что и слово фразы, которое может идти следующим: у
+    остальных она почти никогда не совпадает со словом фразы, а
+    лемматизация — самая дорогая часть прохода.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = []
+        # словоформа -> номер слова фразы (символ автомата)
+        self._forms: Dict[str, int] = {}
+        symbols: Dict[str, int] = {}
+        # переходы, ссылки неудач и найденные фразы для каждого состояния
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+
+        for phrase in phrases:
+            words = split_phrase(phrase)
+            if len(words) < 2:
+                continue
+            self.phrases.append(phrase)
+            state = 0
+            for word in words:
+                symbol = symbols.get(word)
+                if symbol is None:
+                    symbol = symbols[word] = len(symbols)
+                state = self._step_or_add(state, symbol)
+            self._out[state].append(phrase)
+
+        # Сначала точные слова фраз, затем их словоформы (первое слово фразы в приоритете)
+        for word, symbol in symbols.items():
+            self._forms[word] = symbol
+        for word, symbol in symbols.items():
+            for form in expand_keyword(word):
+                self._forms.setdefault(form, symbol)
+        # Начала слов фраз: всех и только первых (для начального состояния)
+        self._prefixes = {word[:2] for word in symbols}
+        self.start_prefixes = {word[:2] for word, symbol in symbols.items() if symbol in self._goto[0]}
+        # Словоформы первых слов фраз: по ним KeywordIndex решает, запускать ли автомат
+        self.start_forms = frozenset(form for form, symbol in self._forms.items() if symbol in self._goto[0])
+
+        self._build_fail_links()
+
+    def _step_or_add(self, state: int, symbol: int) -> int:
+        next_state = self._goto[state].get(symbol)
+        if next_state is None:
+            next_state = len(self._goto)
+            self._goto[state][symbol] = next_state
+            self._goto.append({})
+            self._fail.append(0)
+            self._out.append([])
+        return next_state
+
+    def _build_fail_links(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for symbol, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and symbol not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(symbol, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def can_start(self, word: str, lemma: Optional[str] = None) -> bool:
+        """Может ли с этого слова текста начаться фраза.
+
+        lemma — нормальная форма слова; если она не вычислялась, как в
+        find, достаточно совпадения первых двух букв. Слово с дефисом
+        проверяется по частям.
+        """
+        if word in self.start_forms or lemma in self.start_forms:
+            return True
+        if '-' in word:
+            return any(self.can_start(part) for part in word.split('-'))
+        return lemma is None and word[:2] in self.start_prefixes
+
+    def find(self, tokens: Iterable[str], lemmatize: Optional[Callable[[str], Optional[str]]] = None,
+             lemmas: Optional[Dict[str, Optional[str]]] = None) -> Set[str]:
+        """Ищет фразы в последовательности слов (результат tokenize).
+
+        Слово с дефисом проверяется по частям. lemmas — уже известные
+        нормальные формы слов, дополняется найденными.
+        """
+        found: Set[str] = set()
+        if lemmas is None:
+            lemmas = {}
+        goto, fail, out, forms = self._goto, self._fail, self._out, self._forms
+        prefixes, start_prefixes = self._prefixes, self.start_prefixes
+        state = 0
+        for token in tokens:
+            for word in (token.split('-') if '-' in token else (token,)):
+                symbol = forms.get(word)
+                if symbol is None and lemmatize is not None and \
+                        word[:2] in (prefixes if state else start_prefixes):
+                    if word in lemmas:
+                        lemma = lemmas[word]
+                    else:
+                        lemma = lemmas[word] = _safe_lemmatize(lemmatize, word)
+                    if lemma:
+                        symbol = forms.get(lemma)
+                if symbol is None:
+                    state = 0
+                    continue
+                while state and symbol not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(symbol, 0)
+                if out[state]:
+                    found.update(out[state])
+        return found
+
+
+class KeywordIndex:
+    """Скомпилированный индекс ключевых слов.
+
+    Строится один раз: каждая словоформа из expand_keyword отображается
+    в ключевое слово через хэш-таблицу. Владелец словоформы — первое по
+    порядку ключевое слово, являющееся её префиксом, поэтому стоимость
+    поиска зависит только от длины сообщения, а не от размера списка.
+    Ключевые фразы из нескольких слов ищутся отдельно (PhraseMatcher),
+    их совпадения добавляются к совпадениям отдельных слов.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        # ключевое слово в нижнем регистре -> (позиция, исходное написание)
+        self._order: Dict[str, tuple] = {}
+        # словоформа -> ключевое слово
+        self._forms: Dict[str, str] = {}
+        # ключевое слово в нижнем регистре -> его словоформы (для update)
+        self._expansions: Dict[str, Set[str]] = {}
+        self._phrases = PhraseMatcher([])
+        self.update(keywords)
+
+    def update(self, keywords: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Перестраивает индекс под новый список ключевых слов.
+
+        Словоформы раскрываются только для новых слов, а владельцы
+        пересчитываются только у форм, которые начинаются с добавленного,
+        удаленного или иначе написанного слова. Если порядок оставшихся
+        слов изменился, владельцы пересчитываются у всех форм.
+        Возвращает (добавленные, удаленные) ключевые слова.
+        """
+        new_keywords = list(keywords)
+        order: Dict[str, tuple] = {}
+        for kw in new_keywords:
+            order.setdefault(kw.lower(), (len(order), kw))
+
+        added = [kw for kw in order if kw not in self._order]
+        removed = [kw for kw in self._order if kw not in order]
+        respelled = [kw for kw in order if kw in self._order and self._order[kw][1] != order[kw][1]]
+        reordered = [kw for kw in self._order if kw in order] != [kw for kw in order if kw in self._order]
+
+        candidates: Set[str] = set()
+        for kw in removed:
+            candidates |= self._expansions.pop(kw)
+        for kw in added:
+            self._expansions[kw] = expand_keyword(kw)
+            candidates |= self._expansions[kw]
+
+        changed = tuple(added + removed + respelled)
+        if reordered:
+            candidates.update(self._forms)
+        elif changed:
+            candidates.update(form for form in self._forms if form.startswith(changed))
+
+        self.keywords = new_keywords
+        self._order = order
+        phrases = [original for kw, (_, original) in order.items() if len(split_phrase(kw)) > 1]
+        if phrases != self._phrases.phrases:
+            self._phrases = PhraseMatcher(phrases)
+        for form in candidates:
+            owner = self._resolve_owner(form)
+            if owner is None:
+                self._forms.pop(form, None)
+            else:
+                self._forms[form] = owner
+
+        return ([order[kw][1] for kw in added], removed)
+
+    def _resolve_owner(self, form: str) -> Optional[str]:
+        """Находит первое по порядку ключевое слово, являющееся префиксом формы.
+
+        None, если форма не входит в словоформы ни одного ключевого слова.
+        """
+        best = None
+        present = False
+        for i in range(1, len(form) + 1):
+            prefix = form[:i]
+            entry = self._order.get(prefix)
+            if entry is not None:
+                if best is None or entry[0] < best[0]:
+                    best = entry
+                if not present and form in self._expansions[prefix]:
+                    present = True
+        return best[1] if present else None
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._forms
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Возвращает ключевое слово для словоформы или None"""
+        return self._forms.get(word)
+
+    def find_keywords(self, text: str, lemmatize: Optional[Callable[[str], Optional[str]]] = None) -> List[str]:
+        """Ищет ключевые слова в тексте.
+
+        Слово сначала проверяется как есть; если не найдено — по его
+        нормальной форме, полученной через lemmatize.
+        """
+        matched = set()
+        tokens = tokenize(text)
+        forms = self._forms
+        phrases = self._phrases
+        starts = phrases.start_forms
+        # Автомат фраз запускается, только если с какого-то слова может начаться
+        # фраза: слова текста проверяются одной операцией над множествами,
+        # нормальные формы — по ходу прохода, без второго прохода по словам
+        phrase_start = bool(starts) and not starts.isdisjoint(tokens)
+        for word in tokens:
+            kw = forms.get(word)
+            if kw is None:
+                if lemmatize is not None:
+                    try:
+                        lemma = lemmatize(word)
+                    except Exception:
+                        lemma = None
+                    if lemma:
+                        kw = forms.get(lemma)
+                        if lemma in starts:
+                            phrase_start = True
+            elif starts and not phrase_start and phrases.can_start(word):
+                phrase_start = True
+            if kw is not None:
+                matched.add(kw)
+        if starts and not phrase_start and '-' in text:
+            phrase_start = any(phrases.can_start(word) for word in tokens if '-' in word)
+        if phrase_start:
+            matched |= phrases.find(tokens, lemmatize)
+        return sorted(matched)
+
+    def find_keywords_batch(self, texts: Iterable[str],
+                            lemmatize: Optional[Callable[[str], Optional[str]]] = None) -> List[List[str]]:
+        """Ищет ключевые слова в пачке текстов.
+
+        Каждое различное слово пачки проверяется (и при необходимости
+        лемматизируется) один раз; результат — список ключевых слов
+        для каждого текста в том же порядке.
+        """
+        token_lists = [tokenize(text) for text in texts]
+        resolved: Dict[str, Optional[str]] = {}
+        lemmas: Dict[str, Optional[str]] = {}
+        # Различные слова пачки, с которых может начаться фраза
+        phrase_starts: Set[str] = set()
+        for tokens in token_lists:
+            for word in tokens:
+                if word in resolved:
+                    continue
+                kw = self._forms.get(word)
+                lemma = None
+                if kw is None and lemmatize is not None:
+                    lemma = lemmas[word] = _safe_lemmatize(lemmatize, word)
+                    if lemma:
+                        kw = self._forms.get(lemma)
+                resolved[word] = kw
+                if self._phrases and self._phrases.can_start(word, lemma):
+                    phrase_starts.add(word)
+
+        results = []
+        for tokens in token_lists:
+            matched = {resolved[word] for word in tokens}
+            matched.discard(None)
+            if not phrase_starts.isdisjoint(tokens):
+                matched |= self._phrases.find(tokens, lemmatize, lemmas)
+            results.append(sorted(matched))
+        return results
@@ -0,0 +1,102 @@
+import gzip
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LemmaCache:
+    """LRU-кэш нормальных форм слов поверх pymorphy3"""
+
+    FILE_NAME = 'lemma_cache.tsv.gz'
+
+    def __init__(self, analyzer, maxsize: int = 50000):
+        self.analyzer = analyzer
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.deferred = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _parse(self, word: str) -> str:
+        """Разбор слова анализатором; пустая строка — нормальная форма не найдена"""
+        parses = self.analyzer.parse(word)
+        if parses:
+            return parses[0].normal_form
+        return ''
+
+    def _put(self, word: str, lemma: str):
+        self._cache[word] = lemma
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def lemmatize(self, word: str) -> Optional[str]:
+        """Возвращает нормальную форму слова (из кэша или через анализатор)"""
+        lemma = self._cache.get(word)
+        if lemma is not None:
+            self.hits += 1
+            self._cache.move_to_end(word)
+            return lemma or None
+
+        # Анализатор еще загружается: слово не разбираем и не кэшируем
+        if not getattr(self.analyzer, 'ready', True):
+            self.deferred += 1
+            return None
+
+        self.misses += 1
+        lemma = self._parse(word)
+        self._put(word, lemma)
+        return lemma or None
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'deferred': self.deferred,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def save(self, data_dir: str, limit: Optional[int] = None):
+        """Сохраняет самые востребованные записи в сжатый файл (word<TAB>lemma)"""
+        path = os.path.join(data_dir, self.FILE_NAME)
+        tmp_path = path + '.tmp'
+        try:
+            # Последние элементы OrderedDict — самые свежие
+            items = list(self._cache.items())
+            if limit is not None:
+                items = items[-limit:]
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                for word, lemma in items:
+                    f.write(f"{word}\t{lemma}\n")
+            os.replace(tmp_path, path)
+            logger.info(f"💾 Кэш лемм сохранен: {len(items)} записей")
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения кэша лемм: {e}")
+
+    def load(self, data_dir: str) -> int:
+        """Загружает сохраненные записи; возвращает их количество"""
+        path = os.path.join(data_dir, self.FILE_NAME)
+        if not os.path.exists(path):
+            return 0
+        loaded = 0
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    word, sep, lemma = line.rstrip('\n').partition('\t')
+                    if not sep or not word:
+                        continue
+                    self._put(word, lemma)
+                    loaded += 1
+            logger.info(f"📥 Кэш лемм загружен: {loaded} записей")
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки кэша лемм: {e}")
+        return loaded
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from keyword_index import KeywordIndex
+from lemma_cache import LemmaCache
+
+logger = logging.getLogger(__name__)
+
+# Состояние рабочего процесса: свой анализатор, индекс ключевых слов и версия их списка
+_worker_index: Optional[KeywordIndex] = None
+_worker_lemmas: Optional[LemmaCache] = None
+_worker_version = 0
+
+
+def _init_worker(keywords: Sequence[str], lemma_cache_size: int):
+    """Прогревает рабочий процесс: загружает словари и компилирует индекс"""
+    global _worker_index, _worker_lemmas
+    from pymorphy3 import MorphAnalyzer
+
+    _worker_index = KeywordIndex(keywords)
+    _worker_lemmas = LemmaCache(MorphAnalyzer(), lemma_cache_size)
+
+
+def _apply_keywords(update: Optional[Tuple[int, Tuple[str, ...]]]):
+    """Обновляет индекс рабочего процесса до более новой версии списка ключевых слов"""
+    global _worker_version
+    if update is None:
+        return
+    version, keywords = update
+    if version > _worker_version:
+        _worker_index.update(keywords)
+        _worker_version = version
+
+
+def _match_batch(texts: Sequence[str], update: Optional[Tuple[int, Tuple[str, ...]]] = None) -> List[List[str]]:
+    """Ищет ключевые слова в пачке текстов внутри рабочего процесса"""
+    _apply_keywords(update)
+    return _worker_index.find_keywords_batch(texts, _worker_lemmas.lemmatize)
+
+
+class MatchingPool:
+    """Поиск ключевых слов в пуле процессов.
+
+    Тексты из обработчиков копятся в пачку (до batch_size штук или
+    batch_delay секунд) и отправляются в рабочий процесс; результат
+    возвращается через future, так что event loop занят только I/O.
+
+    После перезагрузки ключевых слов каждое задание несет (версия, список):
+    рабочий процесс, получивший более новую версию, обновляет свой индекс
+    инкрементально (KeywordIndex.update), без перезапуска и загрузки словарей.
+    """
+
+    def __init__(self, keywords: Sequence[str], workers: int, batch_size: int = 64,
+                 batch_delay: float = 0.005, lemma_cache_size: int = 50000):
+        self.keywords = list(keywords)
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self.lemma_cache_size = lemma_cache_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._update: Optional[Tuple[int, Tuple[str, ...]]] = None  # None - список с запуска
+        self._pending = []
+        self._flush_handle = None
+
+    def start(self):
+        """Запускает рабочие процессы"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.keywords, self.lemma_cache_size),
+            )
+            logger.info(f"⚙️ Пул поиска ключевых слов: {self.workers} процессов")
+
+    async def find_keywords(self, text: str) -> List[str]:
+        """Ищет ключевые слова в одном тексте (в составе ближайшей пачки)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+        return await future
+
+    async def find_keywords_batch(self, texts: Sequence[str]) -> List[List[str]]:
+        """Ищет ключевые слова в пачке текстов одним заданием"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _match_batch, list(texts), self._update)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        futures = [future for _, future in batch]
+        job = asyncio.get_running_loop().run_in_executor(
+            self._executor, _match_batch, [text for text, _ in batch], self._update
+        )
+
+        def distribute(job):
+            error = asyncio.CancelledError() if job.cancelled() else job.exception()
+            results = job.result() if error is None else [None] * len(futures)
+            for future, keywords in zip(futures, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(keywords)
+
+        job.add_done_callback(distribute)
+
+    def update_keywords(self, keywords: Sequence[str]):
+        """Передает новый список ключевых слов рабочим процессам со следующими заданиями.
+
+        Уже отправленные пачки ищутся по прежнему списку.
+        """
+        self.keywords = list(keywords)
+        version = self._update[0] + 1 if self._update is not None else 1
+        self._update = (version, tuple(self.keywords))
+
+    def shutdown(self):
+        """Останавливает рабочие процессы"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
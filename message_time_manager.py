@@ -1,17 +1,46 @@
 import sqlite3
 import logging
 import os
+import asyncio
+import threading
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Курсор группы только продвигается вперед: запись с меньшим id (например,
+# сообщение истории, обработанное после нового) не затирает сохраненную;
+# строки без id (из старых версий) перезаписываются
+_SAVE_LAST_MESSAGE = '''
+    INSERT INTO last_messages
+    (group_url, group_id, group_name, last_message_time, last_message_id, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(group_url) DO UPDATE SET
+        group_id = excluded.group_id,
+        group_name = excluded.group_name,
+        last_message_time = excluded.last_message_time,
+        last_message_id = excluded.last_message_id,
+        updated_at = excluded.updated_at
+    WHERE last_messages.last_message_id IS NULL
+        OR excluded.last_message_id >= last_messages.last_message_id
+'''
+
 class MessageTimeManager:
     """Менеджер для работы с временными метками последних сообщений"""
     
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, write_behind: bool = False):
         self.data_dir = data_dir
         self.db_path = os.path.join(data_dir, 'message_times.db')
+        
+        # Режим отложенной записи: последние (время, id) по группам копятся
+        # в памяти и сбрасываются пачкой по таймеру и при остановке
+        self.write_behind = write_behind
+        self._pending: Dict[str, Tuple[int, str, datetime, int]] = {}
+        self._pending_lock = threading.Lock()
+        self._conn = None  # Долгоживущее соединение для сброса (WAL)
+        self._conn_lock = threading.Lock()
+        self._flush_task = None
+        
         self.init_database()
     
     def init_database(self):
@@ -28,6 +57,11 @@ class MessageTimeManager:
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 ''')
+                # По updated_at фильтруют get_statistics и cleanup_old_records
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_last_messages_updated_at
+                    ON last_messages (updated_at)
+                ''')
                 conn.commit()
                 logger.info("✅ База данных инициализирована")
         except Exception as e:
@@ -37,20 +71,100 @@ class MessageTimeManager:
     def save_last_message_time(self, group_url: str, group_id: int, group_name: str, 
                               message_time: datetime, message_id: int):
         """Сохранение времени последнего сообщения"""
+        if self.write_behind:
+            with self._pending_lock:
+                current = self._pending.get(group_url)
+                # Оставляем только самое новое сообщение группы
+                if current is None or message_id >= current[3]:
+                    self._pending[group_url] = (group_id, group_name, message_time, message_id)
+            return
+        
         try:
             with sqlite3.connect(self.db_path) as conn:
-                conn.execute('''
-                    INSERT OR REPLACE INTO last_messages 
-                    (group_url, group_id, group_name, last_message_time, last_message_id, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (group_url, group_id, group_name, message_time, message_id, datetime.now(timezone.utc)))
+                conn.execute(_SAVE_LAST_MESSAGE,
+                             (group_url, group_id, group_name, message_time, message_id, datetime.now(timezone.utc)))
                 conn.commit()
                 logger.debug(f"💾 Сохранено время для группы: {message_time}")
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения времени для группы: {e}")
     
+    def _get_connection(self) -> sqlite3.Connection:
+        """Возвращает долгоживущее соединение в режиме WAL"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
+    
+    def flush(self) -> int:
+        """Сбрасывает накопленные времена в базу одной транзакцией"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        
+        now = datetime.now(timezone.utc)
+        rows = [
+            (group_url, group_id, group_name, message_time, message_id, now)
+            for group_url, (group_id, group_name, message_time, message_id) in pending.items()
+        ]
+        try:
+            with self._conn_lock:
+                conn = self._get_connection()
+                with conn:
+                    conn.executemany(_SAVE_LAST_MESSAGE, rows)
+            logger.debug(f"💾 Сброшено времен для {len(rows)} групп")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сброса времен в базу: {e}")
+            # Возвращаем несохраненное обратно, не затирая более новые значения
+            with self._pending_lock:
+                for group_url, value in pending.items():
+                    current = self._pending.get(group_url)
+                    if current is None or value[3] > current[3]:
+                        self._pending[group_url] = value
+            return 0
+    
+    async def flush_async(self) -> int:
+        """Сбрасывает накопленные времена вне event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.flush)
+    
+    def start_flusher(self, interval: float):
+        """Запускает периодический сброс накопленных времен"""
+        if not self.write_behind or self._flush_task is not None:
+            return
+        
+        async def flush_loop():
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush_async()
+        
+        self._flush_task = asyncio.get_running_loop().create_task(flush_loop())
+    
+    async def close(self):
+        """Останавливает периодический сброс, сохраняет остаток и закрывает соединение"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        await self.flush_async()
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
     def get_last_message_time(self, group_url: str) -> Optional[datetime]:
         """Получение времени последнего сообщения для группы"""
+        with self._pending_lock:
+            pending = self._pending.get(group_url)
+        if pending:
+            return pending[2]
+        
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.execute(
@@ -69,23 +183,28 @@ class MessageTimeManager:
             logger.error(f"❌ Ошибка получения времени для группы: {e}")
             return None
     
-    def get_all_last_times(self) -> Dict[str, Tuple[datetime, int, str]]:
-        """Получение всех сохраненных времен"""
+    def get_all_last_times(self) -> Dict[str, Tuple[datetime, int, str, Optional[int]]]:
+        """Получение всех сохраненных времен: (время, id группы, название, id последнего сообщения)"""
         result = {}
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.execute('''
-                    SELECT group_url, last_message_time, group_id, group_name 
+                    SELECT group_url, last_message_time, group_id, group_name, last_message_id 
                     FROM last_messages
                 ''')
                 for row in cursor.fetchall():
-                    group_url, time_str, group_id, group_name = row
+                    group_url, time_str, group_id, group_name, message_id = row
                     if isinstance(time_str, str):
                         message_time = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
                     else:
                         message_time = time_str
-                    result[group_url] = (message_time, group_id, group_name)
-                logger.info(f"📊 Загружено {len(result)} сохраненных времен")
+                    result[group_url] = (message_time, group_id, group_name, message_id)
+            
+            # Еще не сброшенные значения новее сохраненных
+            with self._pending_lock:
+                for group_url, (group_id, group_name, message_time, message_id) in self._pending.items():
+                    result[group_url] = (message_time, group_id, group_name, message_id)
+            logger.info(f"📊 Загружено {len(result)} сохраненных времен")
         except Exception as e:
             logger.error(f"❌ Ошибка получения всех времен: {e}")
         return result
@@ -0,0 +1,204 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, миллисекунды
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными корзинами"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, pct: float) -> float:
+        """Верхняя граница корзины, в которую попадает перцентиль (не больше максимума)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(float(BUCKETS_MS[i]), self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 3),
+            'p95_ms': round(self.percentile(95), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(self.max, 3),
+        }
+
+
+class Metrics:
+    """Счетчики, значения и гистограммы задержек по этапам обработки"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.groups: Dict[str, dict] = {}
+        self.boot: Dict[str, float] = {}
+        self._providers: Dict[str, Callable[[], dict]] = {}
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, value_ms: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value_ms)
+
+    def observe_lag(self, name: str, message_date: Optional[datetime]):
+        """Задержка от времени сообщения в Telegram до текущего момента"""
+        if message_date is None:
+            return
+        if message_date.tzinfo is None:
+            message_date = message_date.replace(tzinfo=timezone.utc)
+        lag = (datetime.now(timezone.utc) - message_date).total_seconds() * 1000
+        self.observe(name, max(0.0, lag))
+
+    @contextmanager
+    def timer(self, name: str):
+        """Замеряет длительность блока (в том числе с await внутри)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def record_boot(self, stage: str, seconds: float):
+        """Добавляет длительность этапа запуска, секунды"""
+        self.boot[stage] = round(self.boot.get(stage, 0.0) + seconds, 3)
+
+    @contextmanager
+    def boot_stage(self, stage: str):
+        """Замеряет этап запуска"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_boot(stage, time.perf_counter() - start)
+
+    def update_group(self, group_url: str, **values):
+        """Обновляет состояние группы (например, прогресс дочитывания истории)"""
+        self.groups.setdefault(group_url, {}).update(values)
+
+    def register_provider(self, name: str, provider: Callable[[], dict]):
+        """Добавляет в снимок данные внешнего компонента (кэши, очереди)"""
+        self._providers[name] = provider
+
+    def snapshot(self) -> dict:
+        result = {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'latency': {name: h.snapshot() for name, h in self.histograms.items()},
+            'groups': {url: dict(values) for url, values in self.groups.items()},
+            'boot_s': dict(self.boot),
+        }
+        for name, provider in self._providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                result[name] = {'error': type(e).__name__}
+        return result
+
+
+# Общий реестр метрик процесса
+metrics = Metrics()
+
+
+class MetricsExporter:
+    """Отдает метрики по HTTP на localhost и/или периодически пишет их в файл"""
+
+    def __init__(self, registry: Metrics, port: int = 0, path: Optional[str] = None, interval: float = 60):
+        self.registry = registry
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self._server = None
+        self._writer_task = None
+
+    async def start(self):
+        if self.port:
+            self._server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+            print(f"📈 Метрики доступны на http://127.0.0.1:{self.port}/metrics")
+        if self.path:
+            self._writer_task = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _handle(self, reader, writer):
+        try:
+            # Читаем только заголовки запроса: ответ одинаков для любого пути
+            while True:
+                line = await reader.readline()
+                if not line or line in (b'\r\n', b'\n'):
+                    break
+            body = json.dumps(self.registry.snapshot(), ensure_ascii=False).encode('utf-8')
+            writer.write(
+                b'HTTP/1.1 200 OK\r\n'
+                b'Content-Type: application/json; charset=utf-8\r\n'
+                b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                b'Connection: close\r\n\r\n' + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Ошибка HTTP-запроса метрик: {e}")
+        finally:
+            writer.close()
+
+    def write_file(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи метрик: {e}")
+
+    async def _write_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write_file()
+
+    async def stop(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+            self.write_file()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundAnalyzer:
+    """MorphAnalyzer pymorphy3, загружаемый в фоновом потоке.
+
+    Словари pymorphy3 загружаются несколько секунд и занимают заметную
+    память, поэтому загрузка идет параллельно с подключением клиентов.
+    Пока анализатор не готов (ready == False), LemmaCache не разбирает
+    новые слова и поиск работает по точным формам ключевых слов.
+    Если start() не вызывался, словари загружаются при первом parse().
+    """
+
+    def __init__(self):
+        self._analyzer = None
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self.load_time: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._analyzer is not None
+
+    def start(self) -> 'BackgroundAnalyzer':
+        """Запускает загрузку словарей в фоновом потоке"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='morph-loader', daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            from pymorphy3 import MorphAnalyzer
+            self._analyzer = MorphAnalyzer()
+            self.load_time = time.perf_counter() - started
+            logger.info(f"🧠 Словари pymorphy3 загружены за {self.load_time:.2f} с")
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки pymorphy3: {e}")
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Дожидается загрузки (запуская ее при необходимости); True, если анализатор готов"""
+        self.start()
+        self._done.wait(timeout)
+        return self.ready
+
+    async def wait_async(self) -> bool:
+        """То же, что wait(), но не блокирует event loop"""
+        if self._done.is_set():
+            return self.ready
+        return await asyncio.get_running_loop().run_in_executor(None, self.wait)
+
+    def parse(self, word: str):
+        if self._analyzer is None and not self.wait():
+            return []
+        return self._analyzer.parse(word)
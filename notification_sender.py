@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict
+
+from telethon import errors, utils
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Бюджет отправок для одного чата: rate токенов в секунду, не более capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен; если его нет — возвращает, сколько секунд подождать"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def penalize(self, seconds: float):
+        """После FloodWait: следующий токен появится не раньше чем через seconds секунд"""
+        self._refill()
+        self.tokens = 1 - seconds * self.rate
+
+
+class NotificationSender:
+    """Очереди исходящих уведомлений перед bot-клиентом.
+
+    У каждого целевого чата своя очередь, обработчик и бюджет отправок:
+    FloodWait в одном чате не задерживает остальные. При FloodWait
+    обработчик ждет и повторяет отправку, уведомления из реального времени
+    идут раньше найденных в истории.
+    """
+
+    PRIORITY_LIVE = 0
+    PRIORITY_BACKFILL = 1
+
+    def __init__(self, client, rate_per_minute: float = 20, burst: int = 3):
+        self.client = client
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self._queues: Dict[int, asyncio.PriorityQueue] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._counter = itertools.count()
+        self.sent_count = 0
+        self.edited_count = 0
+        self.failed_count = 0
+        self.flood_waits = 0
+
+    @staticmethod
+    def _key(entity) -> int:
+        try:
+            return utils.get_peer_id(entity)
+        except Exception:
+            return getattr(entity, 'id', entity)
+
+    def _queue_for(self, entity) -> asyncio.PriorityQueue:
+        """Очередь чата; обработчик чата запускается при первом уведомлении"""
+        key = self._key(entity)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.PriorityQueue()
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            self._workers[key] = asyncio.get_running_loop().create_task(self._worker(queue, bucket))
+        return queue
+
+    @property
+    def pending(self) -> int:
+        """Число уведомлений в очередях"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def send(self, entity, text: str, priority: int = PRIORITY_LIVE, message_date=None, **kwargs) -> asyncio.Future:
+        """Ставит уведомление в очередь.
+
+        message_date — время исходного сообщения для замера сквозной задержки.
+        Возвращает future с отправленным сообщением (None при ошибке отправки).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue_for(entity).put_nowait(
+            (priority, next(self._counter), (entity, text, message_date, kwargs, future, None)))
+        return future
+
+    def edit(self, entity, message_id: int, text: str, priority: int = PRIORITY_LIVE, **kwargs) -> asyncio.Future:
+        """Ставит в очередь редактирование отправленного уведомления (в том же бюджете отправок)"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue_for(entity).put_nowait(
+            (priority, next(self._counter), (entity, text, None, kwargs, future, message_id)))
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        """Состояние очереди отправки"""
+        return {
+            'pending': self.pending,
+            'sent': self.sent_count,
+            'edited': self.edited_count,
+            'failed': self.failed_count,
+            'flood_waits': self.flood_waits,
+            'targets': {str(key): queue.qsize() for key, queue in self._queues.items()},
+        }
+
+    async def _worker(self, queue: asyncio.PriorityQueue, bucket: TokenBucket):
+        while True:
+            _, _, job = await queue.get()
+            try:
+                await self._deliver(bucket, *job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка очереди уведомлений: {e}")
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, bucket, entity, text, message_date, kwargs, future, edit_id):
+        while True:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                if edit_id is not None:
+                    with metrics.timer('edit_message'):
+                        message = await self.client.edit_message(entity, edit_id, text, **kwargs)
+                    self.edited_count += 1
+                    print(f"✏️ Уведомление обновлено")
+                else:
+                    with metrics.timer('send_message'):
+                        message = await self.client.send_message(entity, text, **kwargs)
+                    self.sent_count += 1
+                    metrics.observe_lag('delivery_lag', message_date)
+                    print(f"✅ Уведомление отправлено")
+                if not future.done():
+                    future.set_result(message)
+                return
+
+            except errors.FloodWaitError as e:
+                # Telegram сообщил, сколько ждать — пауза выдерживается через
+                # бюджет чата, и повтор ждет ее в reserve()
+                self.flood_waits += 1
+                print(f"⏳ Ограничение Telegram: пауза {e.seconds} с перед отправкой")
+                bucket.penalize(e.seconds)
+
+            except Exception as send_error:
+                self.failed_count += 1
+                error_type = type(send_error).__name__
+                print(f"❌ Ошибка отправки: {error_type}")
+
+                if "CHAT_WRITE_FORBIDDEN" in str(send_error):
+                    print("🚫 Нет прав на запись в группу")
+                elif "USER_BANNED_IN_CHANNEL" in str(send_error):
+                    print("🚫 Бот заблокирован в группе")
+                elif "CHAT_ADMIN_REQUIRED" in str(send_error):
+                    print("🚫 Нужны права администратора")
+
+                if not future.done():
+                    future.set_result(None)
+                return
+
+    async def stop(self, timeout: float = 30):
+        """Дожидается отправки очередей (не дольше timeout) и останавливает отправку"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues.values())), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не отправлено уведомлений: {self.pending}")
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers = {}
+        self._queues = {}
+        self._buckets = {}
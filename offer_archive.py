@@ -0,0 +1,223 @@
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Время хранится в UTC в формате SQLite, чтобы сравнивать его с datetime('now', ...)
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Текст для полнотекстового индекса: unicode61 не приравнивает ё к е
+_FTS_TEXT = "replace(replace({0}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+class ArchivedOffer(NamedTuple):
+    id: int
+    chat_id: int
+    message_id: int
+    group_url: Optional[str]
+    group_name: Optional[str]
+    author: Optional[str]
+    text: str
+    keywords: List[str]
+    message_date: Optional[datetime]
+    link: Optional[str]
+
+
+def _to_db_time(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(_TIME_FORMAT)
+
+
+def fts_query(text: str) -> str:
+    """Запрос FTS5 из произвольного текста: все слова, каждое как префикс"""
+    text = text.replace('ё', 'е').replace('Ё', 'Е')
+    words = [word.replace('"', '""') for word in text.split()]
+    return ' '.join(f'"{word}"*' for word in words if word.strip('"'))
+
+
+class OfferArchive:
+    """Архив найденных предложений в базе времен сообщений (message_times.db).
+
+    Таблица offers хранит текст, ключевые слова, группу, автора и время
+    сообщения. По тексту строится полнотекстовый индекс FTS5 без копии
+    текста (строки берутся из offers по rowid), ключевые слова
+    раскладываются в таблицу offer_keywords с индексом по слову.
+    Если SQLite собран без FTS5, поиск по тексту идет через LIKE.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.fts = True
+        self._conn = None
+        self._lock = threading.Lock()
+        self.init_table()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
+
+    def init_table(self):
+        with self._lock:
+            conn = self._get_connection()
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS offers (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        chat_id INTEGER NOT NULL,
+                        message_id INTEGER NOT NULL,
+                        group_url TEXT,
+                        group_name TEXT,
+                        author TEXT,
+                        text TEXT NOT NULL,
+                        keywords TEXT NOT NULL DEFAULT '',
+                        message_date TIMESTAMP,
+                        link TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE (chat_id, message_id)
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_offers_message_date ON offers (message_date)')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS offer_keywords (
+                        keyword TEXT NOT NULL,
+                        offer_id INTEGER NOT NULL,
+                        PRIMARY KEY (keyword, offer_id)
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_offer_keywords_offer ON offer_keywords (offer_id)')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS offers_delete AFTER DELETE ON offers BEGIN
+                        DELETE FROM offer_keywords WHERE offer_id = old.id;
+                    END
+                ''')
+            try:
+                with conn:
+                    conn.execute('''
+                        CREATE VIRTUAL TABLE IF NOT EXISTS offers_fts USING fts5(
+                            text, content='',
+                            tokenize='unicode61 remove_diacritics 2'
+                        )
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS offers_fts_insert AFTER INSERT ON offers BEGIN
+                            INSERT INTO offers_fts (rowid, text) VALUES (new.id, {_FTS_TEXT.format('new.text')});
+                        END
+                    ''')
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS offers_fts_delete AFTER DELETE ON offers BEGIN
+                            INSERT INTO offers_fts (offers_fts, rowid, text)
+                            VALUES ('delete', old.id, {_FTS_TEXT.format('old.text')});
+                        END
+                    ''')
+            except sqlite3.OperationalError as e:
+                self.fts = False
+                logger.warning(f"⚠️ FTS5 недоступен, поиск по тексту будет медленнее: {e}")
+
+    def add(self, chat_id: int, message_id: int, text: str, keywords: Iterable[str],
+            group_url: Optional[str] = None, group_name: Optional[str] = None,
+            author: Optional[str] = None, message_date: Optional[datetime] = None,
+            link: Optional[str] = None) -> Optional[int]:
+        """Сохраняет предложение; None, если оно уже в архиве или запись не удалась"""
+        keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords))
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                with conn:
+                    cursor = conn.execute('''
+                        INSERT OR IGNORE INTO offers
+                        (chat_id, message_id, group_url, group_name, author, text, keywords, message_date, link)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (chat_id, message_id, group_url, group_name, author, text or '',
+                          ', '.join(keywords), _to_db_time(message_date), link))
+                    if not cursor.rowcount:
+                        return None
+                    offer_id = cursor.lastrowid
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO offer_keywords (keyword, offer_id) VALUES (?, ?)',
+                        [(keyword, offer_id) for keyword in keywords]
+                    )
+            return offer_id
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения предложения в архив: {e}")
+            return None
+
+    def search(self, query: Optional[str] = None, keyword: Optional[str] = None,
+               group: Optional[str] = None, since: Optional[datetime] = None,
+               until: Optional[datetime] = None, limit: int = 50) -> List[ArchivedOffer]:
+        """Ищет предложения, новые первыми.
+
+        query - слова текста (все должны встретиться, поиск по началу слова),
+        keyword - найденное ключевое слово, group - часть URL или названия
+        группы, since/until - границы времени сообщения.
+        """
+        sql = ['SELECT o.id, o.chat_id, o.message_id, o.group_url, o.group_name, o.author,'
+               ' o.text, o.keywords, o.message_date, o.link FROM offers o']
+        where = []
+        params = []
+
+        if query and query.strip():
+            if self.fts and fts_query(query):
+                sql.append('JOIN offers_fts f ON f.rowid = o.id')
+                where.append('offers_fts MATCH ?')
+                params.append(fts_query(query))
+            else:
+                for word in query.split():
+                    where.append('o.text LIKE ?')
+                    params.append(f'%{word}%')
+        if keyword:
+            where.append('o.id IN (SELECT offer_id FROM offer_keywords WHERE keyword = ?)')
+            params.append(keyword.lower())
+        if group:
+            where.append('(o.group_url LIKE ? OR o.group_name LIKE ?)')
+            params.extend([f'%{group}%', f'%{group}%'])
+        if since is not None:
+            where.append('o.message_date >= ?')
+            params.append(_to_db_time(since))
+        if until is not None:
+            where.append('o.message_date < ?')
+            params.append(_to_db_time(until))
+
+        if where:
+            sql.append('WHERE ' + ' AND '.join(where))
+        sql.append('ORDER BY o.message_date DESC, o.id DESC LIMIT ?')
+        params.append(limit)
+
+        with self._lock:
+            rows = self._get_connection().execute(' '.join(sql), params).fetchall()
+
+        offers = []
+        for row in rows:
+            keywords = [keyword for keyword in row[7].split(', ') if keyword]
+            message_date = None
+            if row[8]:
+                message_date = datetime.strptime(row[8], _TIME_FORMAT).replace(tzinfo=timezone.utc)
+            offers.append(ArchivedOffer(*row[:7], keywords, message_date, row[9]))
+        return offers
+
+    def top_keywords(self, limit: int = 10) -> List[tuple]:
+        """Самые частые ключевые слова архива: [(слово, число предложений)]"""
+        with self._lock:
+            return self._get_connection().execute('''
+                SELECT keyword, COUNT(*) AS total FROM offer_keywords
+                GROUP BY keyword ORDER BY total DESC, keyword LIMIT ?
+            ''', (limit,)).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total = self._get_connection().execute('SELECT COUNT(*) FROM offers').fetchone()[0]
+        return {'offers': total}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Поиск по архиву найденных предложений (таблица offers в message_times.db)
+
+Примеры:
+    python offers_cli.py саксофон --days 7 --group jazz
+    python offers_cli.py --keyword саксофон --since 2024-05-01
+    python offers_cli.py --top
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from offer_archive import OfferArchive
+
+
+def default_db_path():
+    """База в директории данных бота"""
+    data_dir = "./data" if os.name == 'nt' else "/data"
+    return os.path.join(data_dir, 'message_times.db')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск по архиву найденных предложений")
+    parser.add_argument('query', nargs='*', help="слова текста сообщения (поиск по началу слова)")
+    parser.add_argument('-k', '--keyword', help="найденное ключевое слово")
+    parser.add_argument('-g', '--group', help="часть URL или названия группы")
+    parser.add_argument('-d', '--days', type=float, help="только за последние N дней")
+    parser.add_argument('--since', help="не раньше даты (ГГГГ-ММ-ДД)")
+    parser.add_argument('--until', help="раньше даты (ГГГГ-ММ-ДД)")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="сколько предложений показать (по умолчанию: 20)")
+    parser.add_argument('--top', action='store_true', help="самые частые ключевые слова архива")
+    parser.add_argument('--db', default=default_db_path(), help="путь к message_times.db")
+    return parser.parse_args(argv)
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
+def print_offer(offer):
+    # Время показываем по Москве, как в уведомлениях
+    date_text = (offer.message_date + timedelta(hours=3)).strftime('%d.%m.%Y %H:%M') if offer.message_date else '—'
+    print(f"📅 {date_text}  💬 {offer.group_name or offer.group_url or offer.chat_id}  👤 {offer.author or '—'}")
+    print(f"🔍 {', '.join(offer.keywords)}")
+    print(offer.text.strip())
+    if offer.link:
+        print(f"🔗 {offer.link}")
+    print("-" * 40)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"❌ База не найдена: {args.db}")
+        return 1
+
+    archive = OfferArchive(args.db)
+    try:
+        if args.top:
+            for keyword, total in archive.top_keywords(args.limit):
+                print(f"{total:6d}  {keyword}")
+            return 0
+
+        since = parse_date(args.since) if args.since else None
+        if args.days is not None:
+            since = datetime.now(timezone.utc) - timedelta(days=args.days)
+        until = parse_date(args.until) if args.until else None
+
+        offers = archive.search(' '.join(args.query), args.keyword, args.group, since, until, args.limit)
+        for offer in offers:
+            print_offer(offer)
+        print(f"📊 Найдено предложений: {len(offers)}")
+        return 0
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
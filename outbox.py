@@ -0,0 +1,211 @@
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    chat_id: int
+    message_id: int
+    text: str
+    priority: int
+    message_date: Optional[datetime]
+    kind: str = 'single'
+    target: str = ''
+
+
+class NotificationOutbox:
+    """Журнал уведомлений в базе времен сообщений (message_times.db).
+
+    Найденное сообщение (id чата, id сообщения) записывается один раз и до
+    сохранения курсора группы; после отправки запись помечается
+    доставленной. После перезапуска недоставленные записи отправляются
+    заново без повторного чтения истории, а сообщения, повторно найденные
+    при дочитывании, не отправляются второй раз. Сообщение, попавшее в
+    несколько маршрутов, записывается отдельно для каждого целевого чата
+    (target, '' - TARGET_GROUP).
+    """
+
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+    # Отдельное уведомление или предложение для дайджеста
+    SINGLE = 'single'
+    DIGEST = 'digest'
+
+    def __init__(self, db_path: str, max_attempts: int = 5):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._conn = None
+        self._lock = threading.Lock()
+        self.init_table()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
+
+    def init_table(self):
+        with self._lock:
+            conn = self._get_connection()
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS outbox (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        chat_id INTEGER NOT NULL,
+                        message_id INTEGER NOT NULL,
+                        text TEXT NOT NULL,
+                        priority INTEGER NOT NULL DEFAULT 0,
+                        message_date TIMESTAMP,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        sent_message_id INTEGER,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        delivered_at TIMESTAMP,
+                        kind TEXT NOT NULL DEFAULT 'single',
+                        target TEXT NOT NULL DEFAULT '',
+                        UNIQUE (chat_id, message_id, target)
+                    )
+                ''')
+                # Базы, созданные до появления дайджестов
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(outbox)')}
+                if 'kind' not in columns:
+                    conn.execute("ALTER TABLE outbox ADD COLUMN kind TEXT NOT NULL DEFAULT 'single'")
+                # Базы, созданные до появления маршрутов: ограничение уникальности
+                # меняется только пересозданием таблицы
+                if 'target' not in columns:
+                    self._add_target_column(conn)
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, id)')
+
+    @staticmethod
+    def _add_target_column(conn: sqlite3.Connection):
+        columns = ('id, chat_id, message_id, text, priority, message_date, status, '
+                   'sent_message_id, attempts, created_at, delivered_at, kind')
+        conn.execute('ALTER TABLE outbox RENAME TO outbox_old')
+        conn.execute('DROP INDEX IF EXISTS idx_outbox_status')
+        conn.execute('''
+            CREATE TABLE outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                message_date TIMESTAMP,
+                status TEXT NOT NULL DEFAULT 'pending',
+                sent_message_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                delivered_at TIMESTAMP,
+                kind TEXT NOT NULL DEFAULT 'single',
+                target TEXT NOT NULL DEFAULT '',
+                UNIQUE (chat_id, message_id, target)
+            )
+        ''')
+        conn.execute(f'INSERT INTO outbox ({columns}) SELECT {columns} FROM outbox_old')
+        conn.execute('DROP TABLE outbox_old')
+
+    def add(self, chat_id: int, message_id: int, text: str, priority: int = 0,
+            message_date: Optional[datetime] = None, kind: str = SINGLE, target: str = '') -> Optional[int]:
+        """Записывает уведомление; None, если это сообщение уже было записано для этого чата"""
+        with self._lock:
+            conn = self._get_connection()
+            with conn:
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO outbox (chat_id, message_id, text, priority, message_date, kind, target)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (chat_id, message_id, text, priority,
+                      message_date.isoformat() if message_date else None, kind, target))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def has(self, chat_id: int, message_id: int) -> bool:
+        """Записано ли уже уведомление об этом сообщении"""
+        with self._lock:
+            row = self._get_connection().execute(
+                'SELECT 1 FROM outbox WHERE chat_id = ? AND message_id = ?', (chat_id, message_id)
+            ).fetchone()
+        return row is not None
+
+    def mark_delivered(self, entry_id: int, sent_message_id: Optional[int] = None):
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                with conn:
+                    conn.execute('''
+                        UPDATE outbox SET status = ?, sent_message_id = ?, delivered_at = ?
+                        WHERE id = ?
+                    ''', (self.DELIVERED, sent_message_id, datetime.now(timezone.utc), entry_id))
+        except Exception as e:
+            logger.error(f"❌ Ошибка отметки доставки уведомления: {e}")
+
+    def mark_failed(self, entry_id: int):
+        """Учитывает неудачную попытку; после max_attempts запись больше не отправляется"""
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                with conn:
+                    conn.execute('''
+                        UPDATE outbox SET attempts = attempts + 1,
+                            status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END
+                        WHERE id = ?
+                    ''', (self.max_attempts, self.FAILED, entry_id))
+        except Exception as e:
+            logger.error(f"❌ Ошибка отметки неудачной отправки уведомления: {e}")
+
+    def pending(self, exclude: Iterable[int] = (), limit: int = 1000) -> List[OutboxEntry]:
+        """Недоставленные уведомления в порядке записи"""
+        exclude = set(exclude)
+        with self._lock:
+            rows = self._get_connection().execute('''
+                SELECT id, chat_id, message_id, text, priority, message_date, kind, target
+                FROM outbox WHERE status = ? ORDER BY id LIMIT ?
+            ''', (self.PENDING, limit + len(exclude))).fetchall()
+        entries = []
+        for entry_id, chat_id, message_id, text, priority, date_str, kind, target in rows:
+            if entry_id in exclude:
+                continue
+            message_date = datetime.fromisoformat(date_str) if date_str else None
+            entries.append(OutboxEntry(entry_id, chat_id, message_id, text, priority, message_date, kind, target))
+        return entries[:limit]
+
+    def prune(self, days_old: int = 7) -> int:
+        """Удаляет доставленные и отброшенные записи старше days_old дней"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days_old)
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                with conn:
+                    deleted = conn.execute(
+                        'DELETE FROM outbox WHERE status != ? AND created_at < ?',
+                        (self.PENDING, cutoff.strftime('%Y-%m-%d %H:%M:%S'))
+                    ).rowcount
+            if deleted:
+                logger.info(f"🗑️ Удалено {deleted} старых записей из журнала уведомлений")
+            return deleted
+        except Exception as e:
+            logger.error(f"❌ Ошибка очистки журнала уведомлений: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._get_connection().execute(
+                'SELECT status, COUNT(*) FROM outbox GROUP BY status'
+            ).fetchall()
+        counts = dict(rows)
+        return {
+            'pending': counts.get(self.PENDING, 0),
+            'delivered': counts.get(self.DELIVERED, 0),
+            'failed': counts.get(self.FAILED, 0),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
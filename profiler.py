@@ -0,0 +1,124 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер потока event loop.
+
+    Фоновый поток раз в interval секунд снимает стек потока event loop
+    через sys._current_frames() и учитывает только стеки, проходящие через
+    функции из focus (пустой focus - все стеки). Накопленные стеки раз в
+    flush_interval секунд записываются в свернутом формате
+    (collapsed stacks: "кадр;кадр;кадр число") - его читают flamegraph.pl
+    и speedscope. Сам обработчик событий не инструментируется, поэтому
+    выключенный профайлер ничего не стоит.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.01, flush_interval: float = 60,
+                 focus: Iterable[str] = ()):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.focus = frozenset(focus)
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target_ident: Optional[int] = None
+        self.samples = 0
+        self.flushes = 0
+        self.last_file: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_ident: Optional[int] = None):
+        """Начинает сэмплирование потока thread_ident (по умолчанию - текущего)"""
+        if self._thread is not None:
+            return
+        self._target_ident = thread_ident or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"🔬 Профилирование включено (шаг {self.interval * 1000:.0f} мс)")
+
+    def stop(self):
+        """Останавливает сэмплирование и записывает накопленное"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        logger.info("🔬 Профилирование выключено")
+
+    def toggle(self, thread_ident: Optional[int] = None) -> bool:
+        """Включает или выключает профилирование; возвращает новое состояние"""
+        if self.running:
+            self.stop()
+        else:
+            self.start(thread_ident)
+        return self.running
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def sample(self):
+        frame = sys._current_frames().get(self._target_ident)
+        if frame is None:
+            return
+        names = []
+        focused = not self.focus
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name in self.focus:
+                focused = True
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if not focused:
+            return
+        stack = ';'.join(reversed(names))
+        with self._lock:
+            self._stacks[stack] += 1
+            self.samples += 1
+
+    def flush(self) -> Optional[str]:
+        """Записывает накопленные стеки в новый файл и начинает накопление заново"""
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+        if not stacks:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed")
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error(f"❌ Ошибка записи профиля: {e}")
+            return None
+        self.flushes += 1
+        self.last_file = path
+        return path
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'samples': self.samples,
+            'flushes': self.flushes,
+            'last_file': self.last_file,
+        }
@@ -0,0 +1,42 @@
+from typing import Dict, Iterable, List, Tuple, Union
+
+
+# Ключ целевой группы TARGET_GROUP в таблице маршрутов и журнале уведомлений
+DEFAULT_TARGET = ''
+
+
+def parse_target(target: str) -> Union[int, str]:
+    """ID чата числом, @username или ссылка - как есть"""
+    return int(target) if target.lstrip('-').isdigit() else target
+
+
+class RoutingTable:
+    """Маршруты уведомлений: ключевое слово -> целевые чаты.
+
+    Таблица строится один раз из ROUTES; для найденного сообщения цели
+    определяются по ключевым словам, которые уже вернул find_keywords,
+    без повторного поиска. Сообщение со словами из нескольких маршрутов
+    уходит в каждый из них, без маршрутов - в TARGET_GROUP.
+    """
+
+    def __init__(self, routes: Iterable[Tuple[str, Iterable[str]]] = ()):
+        table: Dict[str, List[str]] = {}
+        for target, keywords in routes:
+            for keyword in keywords:
+                targets = table.setdefault(keyword.lower(), [])
+                if target not in targets:
+                    targets.append(target)
+        self._table: Dict[str, Tuple[str, ...]] = {keyword: tuple(targets) for keyword, targets in table.items()}
+        self.targets = tuple(dict.fromkeys(target for targets in self._table.values() for target in targets))
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def route(self, keywords: Iterable[str]) -> Tuple[str, ...]:
+        """Цели для найденных ключевых слов в порядке маршрутов"""
+        targets = []
+        for keyword in keywords:
+            for target in self._table.get(keyword.lower(), ()):
+                if target not in targets:
+                    targets.append(target)
+        return tuple(targets) or (DEFAULT_TARGET,)
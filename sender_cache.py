@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class SenderProfile:
+    """Данные автора, нужные для уведомления"""
+
+    __slots__ = ('id', 'username', 'first_name', 'last_name')
+
+    def __init__(self, id: int, username: Optional[str] = None,
+                 first_name: Optional[str] = None, last_name: Optional[str] = None):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    @classmethod
+    def from_sender(cls, sender) -> 'SenderProfile':
+        return cls(
+            sender.id,
+            getattr(sender, 'username', None),
+            getattr(sender, 'first_name', None),
+            getattr(sender, 'last_name', None),
+        )
+
+
+class SenderCache:
+    """LRU-кэш профилей авторов с ограниченным временем жизни записей"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, sender_id: int) -> Optional[SenderProfile]:
+        """Возвращает профиль из кэша или None, если его нет или он устарел"""
+        entry = self._cache.get(sender_id)
+        if entry is not None:
+            expires_at, profile = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(sender_id)
+                self.hits += 1
+                return profile
+            del self._cache[sender_id]
+        self.misses += 1
+        return None
+
+    def put(self, sender) -> SenderProfile:
+        """Запоминает профиль автора"""
+        profile = sender if isinstance(sender, SenderProfile) else SenderProfile.from_sender(sender)
+        self._cache[profile.id] = (time.monotonic() + self.ttl, profile)
+        self._cache.move_to_end(profile.id)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return profile
+
+    async def get_profile(self, event) -> Optional[SenderProfile]:
+        """Профиль автора сообщения; запрос к Telegram только при промахе кэша"""
+        sender_id = event.sender_id
+        if sender_id is not None:
+            profile = self.get(sender_id)
+            if profile is not None:
+                return profile
+
+        sender = await event.get_sender()
+        if sender is None:
+            return None
+        return self.put(sender)
+
+    def stats(self) -> Dict[str, float]:
+        """Счетчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,68 @@
+import asyncio
+import zlib
+from typing import List
+
+from telethon import functions
+
+from entity_cache import EntityCache
+
+
+def shard_index(group_url: str, count: int) -> int:
+    """Номер сессии, за которой закреплена группа (стабилен между запусками)"""
+    if count <= 1:
+        return 0
+    return zlib.crc32(group_url.encode('utf-8')) % count
+
+
+class UserShard:
+    """Сессия userbot, которая отслеживает свою часть групп.
+
+    У каждой сессии свой клиент, свой кэш групп (access hash зависит от
+    аккаунта) и свой фильтр событий; FloodWait одной сессии не задерживает
+    остальные.
+    """
+
+    def __init__(self, name: str, client, entity_cache: EntityCache):
+        self.name = name
+        self.client = client
+        self.entity_cache = entity_cache
+        self.monitored_chats: List[int] = []  # id чатов для фильтра событий
+        self.message_filter = None  # Фильтр NewMessage, обновляется при перезагрузке
+        self._reconnecting = False
+
+    def add_chat(self, peer_id: int):
+        if peer_id in self.monitored_chats:
+            return
+        self.monitored_chats.append(peer_id)
+        # Фильтр уже разрешен Telethon в множество id: дополняем его на месте
+        if self.message_filter is not None and self.message_filter.resolved:
+            self.message_filter.chats.add(peer_id)
+
+    def remove_chat(self, peer_id: int):
+        if peer_id in self.monitored_chats:
+            self.monitored_chats.remove(peer_id)
+        if self.message_filter is not None and self.message_filter.resolved:
+            self.message_filter.chats.discard(peer_id)
+
+    async def reconnect(self):
+        """Переподключает сессию и запрашивает пропущенные обновления"""
+        if self._reconnecting:
+            return
+        self._reconnecting = True
+        try:
+            await self.client.disconnect()
+            await self.client.connect()
+            await self.client(functions.updates.GetStateRequest())
+            await self.client.catch_up()
+        finally:
+            self._reconnecting = False
+
+    async def run_until_disconnected(self):
+        """Работает до отключения сессии; переподключение через reconnect() его не завершает"""
+        # Запрос сообщает Telegram, что сессии нужны обновления
+        await self.client(functions.updates.GetStateRequest())
+        while True:
+            await self.client.disconnected
+            if not self._reconnecting and not self.client.is_connected():
+                break
+            await asyncio.sleep(1)
@@ -0,0 +1,186 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+# Предел удвоения допустимой тишины после подтвержденных остановок (2**6 = 64 раза)
+MAX_BACKOFF = 6
+
+
+class _Activity:
+    """Ритм событий одной группы или сессии: время последнего события и
+    экспоненциальное скользящее среднее интервала между событиями.
+    misses - сколько остановок подтверждено без новых событий: каждая
+    удваивает допустимую тишину (тихой ночью проверки реже)"""
+
+    __slots__ = ('last_seen', 'interval', 'samples', 'lag', 'misses')
+
+    def __init__(self):
+        self.last_seen: Optional[float] = None
+        self.interval: Optional[float] = None
+        self.samples = 0
+        self.lag: Optional[float] = None
+        self.misses = 0
+
+    def record(self, now: float, alpha: float):
+        if self.last_seen is not None:
+            gap = now - self.last_seen
+            self.interval = gap if self.interval is None else self.interval + alpha * (gap - self.interval)
+            self.samples += 1
+        self.last_seen = now
+        self.misses = 0
+
+    def observe_lag(self, lag: float, alpha: float):
+        self.lag = lag if self.lag is None else self.lag + alpha * (lag - self.lag)
+
+    def allowed_silence(self, factor: float, min_silence: float) -> float:
+        return max(min_silence, factor * (self.interval or 0.0)) * (1 << self.misses)
+
+    def stalled(self, now: float, factor: float, min_silence: float, min_samples: int) -> bool:
+        if self.last_seen is None or self.samples < min_samples:
+            return False
+        return now - self.last_seen > self.allowed_silence(factor, min_silence)
+
+
+class StallWatchdog:
+    """Сторож потока событий.
+
+    Для каждой группы и сессии userbot отслеживает время последнего
+    события и его обычный ритм (EWMA интервала), а также задержку от
+    времени сообщения до обработки. Группа считается замолчавшей, если
+    тишина дольше factor обычных интервалов (но не меньше min_silence).
+    Сессия считается замолчавшей, только если молчит она сама и каждая
+    из нескольких (min_stalled_groups, но не больше проверяемых) ее групп
+    молчит дольше своего ритма: общая тишина ночью остановкой не считается.
+    Повторно сессия признается замолчавшей не раньше чем через
+    reconnect_interval секунд после прошлого переподключения. Группы с
+    редкими сообщениями (меньше min_samples интервалов) не проверяются.
+    """
+
+    def __init__(self, factor: float = 5, min_silence: float = 600, min_samples: int = 5,
+                 alpha: float = 0.2, min_stalled_groups: int = 3, reconnect_interval: float = 1800):
+        self.factor = factor
+        self.min_silence = min_silence
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.min_stalled_groups = max(1, min_stalled_groups)
+        self.reconnect_interval = reconnect_interval
+        self._groups: Dict[str, _Activity] = {}
+        self._shards: Dict[str, _Activity] = {}
+        self._group_shards: Dict[str, str] = {}
+        self._last_ids: Dict[str, int] = {}  # группа -> id последнего полученного сообщения
+        self._reconnected: Dict[str, float] = {}  # сессия -> время последнего переподключения
+        self.checks = 0
+        self.probes = 0
+        self.quiet = 0
+        self.stalls = 0
+        self.reconnects = 0
+
+    def record(self, group_url: str, shard: str, now: Optional[float] = None,
+               message_id: Optional[int] = None):
+        """Учитывает полученное событие"""
+        now = time.monotonic() if now is None else now
+        self._groups.setdefault(group_url, _Activity()).record(now, self.alpha)
+        self._shards.setdefault(shard, _Activity()).record(now, self.alpha)
+        self._group_shards[group_url] = shard
+        if message_id is not None:
+            self.note_message_id(group_url, message_id)
+
+    def note_message_id(self, group_url: str, message_id: int):
+        """Запоминает id сообщения группы, не считая его событием потока"""
+        if message_id > self._last_ids.get(group_url, 0):
+            self._last_ids[group_url] = message_id
+
+    def last_message_id(self, group_url: str) -> Optional[int]:
+        """id последнего полученного сообщения группы (для проверки тишины запросом)"""
+        return self._last_ids.get(group_url)
+
+    def observe_lag(self, group_url: str, shard: str, message_date: Optional[datetime]):
+        """Учитывает задержку от времени сообщения до его обработки"""
+        if message_date is None:
+            return
+        if message_date.tzinfo is None:
+            message_date = message_date.replace(tzinfo=timezone.utc)
+        lag = max(0.0, (datetime.now(timezone.utc) - message_date).total_seconds())
+        for activity in (self._groups.get(group_url), self._shards.get(shard)):
+            if activity is not None:
+                activity.observe_lag(lag, self.alpha)
+
+    def stalled_groups(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return [url for url, activity in self._groups.items()
+                if activity.stalled(now, self.factor, self.min_silence, self.min_samples)]
+
+    def stalled_shards(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        checked: Dict[str, int] = {}
+        stalled: Dict[str, int] = {}
+        for url, activity in self._groups.items():
+            if activity.samples < self.min_samples:
+                continue
+            shard = self._group_shards.get(url)
+            checked[shard] = checked.get(shard, 0) + 1
+            if activity.stalled(now, self.factor, self.min_silence, self.min_samples):
+                stalled[shard] = stalled.get(shard, 0) + 1
+        
+        result = []
+        for name, activity in self._shards.items():
+            if not activity.stalled(now, self.factor, self.min_silence, self.min_samples):
+                continue
+            if not checked.get(name) or stalled.get(name, 0) < min(self.min_stalled_groups, checked[name]):
+                continue
+            reconnected = self._reconnected.get(name)
+            if reconnected is not None and now - reconnected < self.reconnect_interval:
+                continue
+            result.append(name)
+        return result
+
+    def acknowledge(self, group_urls: Iterable[str] = (), shards: Iterable[str] = (),
+                    now: Optional[float] = None):
+        """Начинает отсчет тишины заново после восстановления; пока событий
+        нет, допустимая тишина удваивается, а сессия не переподключается
+        чаще reconnect_interval"""
+        now = time.monotonic() if now is None else now
+        for url in group_urls:
+            if url in self._groups:
+                self._acknowledge(self._groups[url], now)
+        for name in shards:
+            self._reconnected[name] = now
+            if name in self._shards:
+                self._acknowledge(self._shards[name], now)
+
+    @staticmethod
+    def _acknowledge(activity: _Activity, now: float):
+        activity.last_seen = now
+        activity.misses = min(activity.misses + 1, MAX_BACKOFF)
+
+    def forget(self, group_url: str):
+        self._groups.pop(group_url, None)
+        self._group_shards.pop(group_url, None)
+        self._last_ids.pop(group_url, None)
+
+    def group_state(self, group_url: str, now: Optional[float] = None) -> Optional[dict]:
+        """Состояние группы для метрик"""
+        activity = self._groups.get(group_url)
+        if activity is None:
+            return None
+        return self._state(activity, time.monotonic() if now is None else now)
+
+    def _state(self, activity: _Activity, now: float) -> dict:
+        return {
+            'last_event_age_s': round(now - activity.last_seen, 1),
+            'expected_interval_s': round(activity.interval, 1) if activity.interval is not None else None,
+            'lag_s': round(activity.lag, 2) if activity.lag is not None else None,
+            'stalled': activity.stalled(now, self.factor, self.min_silence, self.min_samples),
+        }
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'checks': self.checks,
+            'probes': self.probes,
+            'quiet': self.quiet,
+            'stalls': self.stalls,
+            'reconnects': self.reconnects,
+            'stalled_groups': len(self.stalled_groups(now)),
+            'shards': {name: self._state(activity, now) for name, activity in self._shards.items()},
+        }
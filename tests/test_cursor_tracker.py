@@ -0,0 +1,62 @@
+from ingest import CursorTracker
+
+
+def test_cursor_moves_in_order():
+    tracker = CursorTracker()
+    tracker.begin('g', 1)
+    tracker.begin('g', 2)
+    assert tracker.finish('g', 1, 'm1') == 'm1'
+    assert tracker.finish('g', 2, 'm2') == 'm2'
+
+
+def test_cursor_waits_for_earlier_messages():
+    tracker = CursorTracker()
+    for message_id in (1, 2, 3):
+        tracker.begin('g', message_id)
+    # 2 и 3 обработаны раньше 1: курсор не сдвигается, пока 1 в обработке
+    assert tracker.finish('g', 3, 'm3') is None
+    assert tracker.finish('g', 2, 'm2') is None
+    assert tracker.finish('g', 1, 'm1') == 'm3'
+
+
+def test_failed_message_blocks_cursor():
+    tracker = CursorTracker()
+    tracker.begin('g', 1)
+    tracker.begin('g', 2)
+    # Сообщение 1 не удалось обработать: finish для него не вызывается
+    assert tracker.finish('g', 2, 'm2') is None
+    tracker.begin('g', 3)
+    assert tracker.finish('g', 3, 'm3') is None
+
+
+def test_hold_blocks_later_messages():
+    tracker = CursorTracker()
+    tracker.hold('g', 5)
+    tracker.begin('g', 6)
+    assert tracker.finish('g', 6, 'm6') is None
+
+
+def test_finish_without_payload_does_not_move_cursor_onto_message():
+    tracker = CursorTracker()
+    tracker.begin('g', 1)
+    tracker.begin('g', 2)
+    assert tracker.finish('g', 2) is None
+    assert tracker.finish('g', 1, 'm1') == 'm1'
+
+
+def test_groups_are_independent():
+    tracker = CursorTracker()
+    tracker.begin('a', 1)
+    tracker.begin('b', 10)
+    assert tracker.finish('b', 10, 'b10') == 'b10'
+    assert tracker.finish('a', 1, 'a1') == 'a1'
+
+
+def test_forget_drops_group_state():
+    tracker = CursorTracker()
+    tracker.begin('g', 1)
+    tracker.begin('g', 2)
+    tracker.finish('g', 2, 'm2')
+    tracker.forget('g')
+    tracker.begin('g', 3)
+    assert tracker.finish('g', 3, 'm3') == 'm3'
@@ -0,0 +1,73 @@
+import dedup
+from dedup import OfferDeduplicator
+
+OFFER = ('Ищем барабанщика в кавер-группу на корпоратив в субботу, '
+         'репетиция в пятницу вечером, оплата по договоренности, пишите в личку')
+
+
+def test_exact_copy_ignores_case_punctuation_and_links():
+    deduplicator = OfferDeduplicator()
+    deduplicator.add(OFFER, 'first')
+    copy = OFFER.upper().replace(',', '!') + ' https://t.me/some_group/123'
+    assert deduplicator.find(copy) == 'first'
+
+
+def test_slightly_edited_copy_is_found():
+    deduplicator = OfferDeduplicator()
+    deduplicator.add(OFFER, 'first')
+    assert deduplicator.find(OFFER.replace('в личку', 'в лс')) == 'first'
+
+
+def test_different_offer_is_not_a_duplicate():
+    deduplicator = OfferDeduplicator()
+    deduplicator.add(OFFER, 'first')
+    assert deduplicator.find('Продам гитару Fender в отличном состоянии, самовывоз из центра города') is None
+
+
+def test_short_texts_are_compared_exactly():
+    deduplicator = OfferDeduplicator(min_tokens=6)
+    deduplicator.add('нужен басист срочно', 'first')
+    assert deduplicator.find('Нужен басист, срочно!') == 'first'
+    assert deduplicator.find('нужен барабанщик срочно') is None
+
+
+def test_removed_entry_is_forgotten():
+    deduplicator = OfferDeduplicator()
+    entry_id = deduplicator.add(OFFER, 'first')
+    deduplicator.remove(entry_id)
+    assert deduplicator.find(OFFER) is None
+    assert len(deduplicator) == 0
+
+
+def test_oldest_entries_are_evicted_over_limit():
+    deduplicator = OfferDeduplicator(max_entries=2)
+    texts = [f'{OFFER} вариант {word}' for word in ('первый', 'второй', 'третий')]
+    for index, text in enumerate(texts):
+        deduplicator.add(text, index)
+    assert len(deduplicator) == 2
+    assert deduplicator.find(texts[2]) == 2
+    # Первая запись вытеснена; похожие тексты находятся по оставшимся
+    assert deduplicator.find(texts[0]) in (1, 2)
+
+
+def test_entries_expire_after_window(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(dedup.time, 'monotonic', lambda: clock[0])
+    deduplicator = OfferDeduplicator(window=60)
+    deduplicator.add(OFFER, 'first')
+    clock[0] += 30
+    assert deduplicator.find(OFFER) == 'first'
+    clock[0] += 31
+    assert deduplicator.find(OFFER) is None
+    assert len(deduplicator) == 0
+
+
+def test_find_does_not_count_statistics():
+    deduplicator = OfferDeduplicator()
+    deduplicator.add(OFFER, 'first')
+    deduplicator.find(OFFER)
+    deduplicator.find(OFFER)
+    assert deduplicator.stats()['checked'] == 0
+    deduplicator.count(duplicate=True)
+    deduplicator.count(duplicate=False)
+    assert deduplicator.stats() == {'size': 1, 'checked': 2, 'duplicates': 1}
@@ -0,0 +1,28 @@
+from digest import split_digest
+
+
+def header(part, total):
+    return f'Дайджест {part}/{total}'
+
+
+def test_short_texts_fit_one_message():
+    [(indexes, message)] = split_digest(['первое', 'второе'], 4096, header)
+    assert indexes == [0, 1]
+    assert message == 'Дайджест 1/1\n\nпервое\n\nвторое'
+
+
+def test_messages_respect_max_length_and_keep_order():
+    texts = [f'предложение {i} ' + 'x' * 300 for i in range(30)]
+    parts = split_digest(texts, 1000, header)
+    assert len(parts) > 1
+    assert [i for indexes, _ in parts for i in indexes] == list(range(30))
+    for part, (_, message) in enumerate(parts, 1):
+        assert len(message) <= 1000
+        assert message.startswith(header(part, len(parts)))
+
+
+def test_too_long_text_is_truncated():
+    [(indexes, message)] = split_digest(['x' * 5000], 1000, header)
+    assert indexes == [0]
+    assert len(message) <= 1000
+    assert message.endswith('…')
@@ -0,0 +1,81 @@
+from keyword_index import KeywordIndex, PhraseMatcher, tokenize
+
+KEYWORDS = ['Гитарист', 'барабан', 'бас', 'вокал', 'для дет', 'кавер-бэнд']
+
+TEXTS = [
+    'Ищем гитаристку в группу',
+    'Нужен барабанщик и вокалистка',
+    'Занятия для детей по выходным',
+    'Для всех детей бесплатно',
+    'Собираем кавер бэнд на свадьбу',
+    'кавер-бэнда ищет басиста',
+    'Продам велосипед',
+    '',
+]
+
+
+def fake_lemmatize(word):
+    return {'гитаристов': 'гитарист', 'детишкам': 'дет'}.get(word)
+
+
+def test_finds_word_forms_with_original_spelling():
+    index = KeywordIndex(KEYWORDS)
+    assert index.find_keywords('Ищем гитаристку') == ['Гитарист']
+    assert index.find_keywords('Нужен барабанщик и вокалистка') == ['барабан', 'вокал']
+    assert index.find_keywords('Продам велосипед') == []
+
+
+def test_falls_back_to_lemma():
+    index = KeywordIndex(['гитарист'])
+    assert index.find_keywords('Нет гитаристов') == []
+    assert index.find_keywords('Нет гитаристов', fake_lemmatize) == ['гитарист']
+
+
+def test_failing_lemmatizer_is_ignored():
+    def broken(word):
+        raise RuntimeError('analyzer failed')
+
+    index = KeywordIndex(['гитарист'])
+    assert index.find_keywords('Ищем гитариста', broken) == ['гитарист']
+
+
+def test_phrase_requires_consecutive_words():
+    index = KeywordIndex(KEYWORDS)
+    assert index.find_keywords('Занятия для детей') == ['для дет']
+    assert index.find_keywords('Для всех детей') == []
+    assert index.find_keywords('Собираем кавер бэнд') == ['кавер-бэнд']
+    assert index.find_keywords('кавер-бэнда ищет басист') == ['бас', 'кавер-бэнд']
+
+
+def test_phrase_matcher_uses_lemmas():
+    matcher = PhraseMatcher(['для дет'])
+    assert matcher.find(tokenize('подарки для детишкам')) == set()
+    assert matcher.find(tokenize('подарки для детишкам'), fake_lemmatize) == {'для дет'}
+
+
+def test_batch_matches_single_search():
+    index = KeywordIndex(KEYWORDS)
+    expected = [index.find_keywords(text, fake_lemmatize) for text in TEXTS]
+    assert index.find_keywords_batch(TEXTS, fake_lemmatize) == expected
+
+
+def test_update_matches_fresh_build():
+    index = KeywordIndex(KEYWORDS)
+    for keywords in (
+        KEYWORDS + ['клавиш'],             # добавлено слово
+        ['Гитарист', 'бас', 'для дет'],    # удалены слова и фраза
+        ['бас', 'Гитарист', 'для дет'],    # изменен порядок
+        ['ГИТАРИСТ', 'бас', 'для взросл'],  # иное написание и новая фраза
+        [],
+    ):
+        added, removed = index.update(keywords)
+        fresh = KeywordIndex(keywords)
+        assert index._forms == fresh._forms
+        assert index.keywords == keywords
+        for text in TEXTS:
+            assert index.find_keywords(text, fake_lemmatize) == fresh.find_keywords(text, fake_lemmatize)
+
+
+def test_update_reports_added_and_removed():
+    index = KeywordIndex(['бас', 'вокал'])
+    assert index.update(['бас', 'Клавиш']) == (['Клавиш'], ['вокал'])
@@ -0,0 +1,45 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from message_time_manager import MessageTimeManager
+
+
+def at(hour):
+    return datetime(2026, 1, 1, hour, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_cursor_only_moves_forward(tmp_path, write_behind):
+    manager = MessageTimeManager(str(tmp_path), write_behind=write_behind)
+    for message_time, message_id in ((at(5), 50), (at(3), 30)):
+        manager.save_last_message_time('g', 1, 'Group', message_time, message_id)
+        manager.flush()
+    assert manager.get_all_last_times()['g'] == (at(5), 1, 'Group', 50)
+
+    manager.save_last_message_time('g', 1, 'Group', at(6), 60)
+    manager.flush()
+    assert manager.get_all_last_times()['g'] == (at(6), 1, 'Group', 60)
+
+
+def test_write_behind_saves_only_on_flush(tmp_path):
+    manager = MessageTimeManager(str(tmp_path), write_behind=True)
+    saved = MessageTimeManager(str(tmp_path))  # читает только базу
+    manager.save_last_message_time('g', 1, 'Group', at(5), 50)
+    manager.save_last_message_time('g', 1, 'Group', at(4), 40)
+    assert manager.get_all_last_times()['g'][3] == 50
+    assert saved.get_all_last_times() == {}
+    assert manager.flush() == 1
+    assert saved.get_all_last_times()['g'][3] == 50
+
+
+def test_row_without_message_id_is_overwritten(tmp_path):
+    manager = MessageTimeManager(str(tmp_path))
+    with sqlite3.connect(manager.db_path) as conn:
+        conn.execute('''
+            INSERT INTO last_messages (group_url, group_id, group_name, last_message_time)
+            VALUES ('g', 1, 'Group', ?)
+        ''', (at(1),))
+    manager.save_last_message_time('g', 1, 'Group', at(2), 5)
+    assert manager.get_all_last_times()['g'] == (at(2), 1, 'Group', 5)
@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import datetime, timezone
+
+from outbox import NotificationOutbox
+
+
+def make_outbox(tmp_path, **kwargs):
+    return NotificationOutbox(str(tmp_path / 'message_times.db'), **kwargs)
+
+
+def test_message_is_recorded_once_per_target(tmp_path):
+    outbox = make_outbox(tmp_path)
+    first = outbox.add(-100, 1, 'text')
+    assert first is not None
+    assert outbox.add(-100, 1, 'text') is None
+    assert outbox.add(-100, 1, 'text', target='@route') is not None
+    assert outbox.has(-100, 1)
+    assert not outbox.has(-100, 2)
+
+
+def test_pending_keeps_order_and_fields(tmp_path):
+    outbox = make_outbox(tmp_path)
+    date = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+    first = outbox.add(-100, 1, 'first', priority=1, message_date=date)
+    second = outbox.add(-100, 2, 'second', kind=NotificationOutbox.DIGEST, target='@route')
+
+    entries = outbox.pending()
+    assert [entry.id for entry in entries] == [first, second]
+    assert entries[0].priority == 1
+    assert entries[0].message_date == date
+    assert entries[1].kind == NotificationOutbox.DIGEST
+    assert entries[1].target == '@route'
+    assert [entry.id for entry in outbox.pending(exclude=[first])] == [second]
+    assert [entry.id for entry in outbox.pending(limit=1)] == [first]
+
+
+def test_delivered_entries_are_not_retried(tmp_path):
+    outbox = make_outbox(tmp_path)
+    entry_id = outbox.add(-100, 1, 'text')
+    outbox.mark_delivered(entry_id, sent_message_id=42)
+    assert outbox.pending() == []
+    assert outbox.stats() == {'pending': 0, 'delivered': 1, 'failed': 0}
+
+
+def test_failed_entries_are_retried_until_max_attempts(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=3)
+    entry_id = outbox.add(-100, 1, 'text')
+    for _ in range(2):
+        outbox.mark_failed(entry_id)
+        assert [entry.id for entry in outbox.pending()] == [entry_id]
+    outbox.mark_failed(entry_id)
+    assert outbox.pending() == []
+    assert outbox.stats()['failed'] == 1
+
+
+def test_pending_survives_reopen(tmp_path):
+    outbox = make_outbox(tmp_path)
+    entry_id = outbox.add(-100, 1, 'text')
+    outbox.close()
+    assert [entry.id for entry in make_outbox(tmp_path).pending()] == [entry_id]
+
+
+def test_prune_keeps_pending_entries(tmp_path):
+    outbox = make_outbox(tmp_path)
+    delivered = outbox.add(-100, 1, 'old')
+    outbox.mark_delivered(delivered)
+    pending = outbox.add(-100, 2, 'waiting')
+    with sqlite3.connect(outbox.db_path) as conn:
+        conn.execute("UPDATE outbox SET created_at = '2000-01-01 00:00:00'")
+    assert outbox.prune(days_old=7) == 1
+    assert [entry.id for entry in outbox.pending()] == [pending]
+
+
+def test_migrates_table_without_kind_and_target(tmp_path):
+    db_path = tmp_path / 'message_times.db'
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                message_date TIMESTAMP,
+                status TEXT NOT NULL DEFAULT 'pending',
+                sent_message_id INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                delivered_at TIMESTAMP,
+                UNIQUE (chat_id, message_id)
+            )
+        ''')
+        conn.execute("INSERT INTO outbox (chat_id, message_id, text) VALUES (-100, 1, 'old')")
+
+    outbox = NotificationOutbox(str(db_path))
+    [entry] = outbox.pending()
+    assert (entry.chat_id, entry.message_id, entry.text) == (-100, 1, 'old')
+    assert (entry.kind, entry.target) == (NotificationOutbox.SINGLE, '')
+    # После миграции уникальность учитывает целевой чат
+    assert outbox.add(-100, 1, 'old') is None
+    assert outbox.add(-100, 1, 'old', target='@route') is not None
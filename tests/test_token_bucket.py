@@ -0,0 +1,31 @@
+import notification_sender
+from notification_sender import TokenBucket
+
+
+def make_bucket(monkeypatch, rate, capacity):
+    clock = [1000.0]
+    monkeypatch.setattr(notification_sender.time, 'monotonic', lambda: clock[0])
+    return TokenBucket(rate, capacity), clock
+
+
+def test_burst_then_wait(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch, rate=1.0, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == 1.0
+    clock[0] += 1
+    assert bucket.reserve() == 0.0
+
+
+def test_tokens_do_not_exceed_capacity(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch, rate=1.0, capacity=2)
+    clock[0] += 100
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_penalize_delays_next_token(monkeypatch):
+    bucket, clock = make_bucket(monkeypatch, rate=0.5, capacity=3)
+    bucket.penalize(30)
+    assert bucket.reserve() == 30.0
+    clock[0] += 30
+    assert bucket.reserve() == 0.0
@@ -0,0 +1,40 @@
+from update_state import MessageGapDetector
+
+
+def test_first_message_is_not_a_gap():
+    detector = MessageGapDetector(min_missing=20)
+    assert detector.observe('g', 1000) == 0
+
+
+def test_small_holes_are_ignored():
+    detector = MessageGapDetector(min_missing=20)
+    detector.observe('g', 100)
+    assert detector.observe('g', 110) == 0
+    assert detector.gaps == 0
+
+
+def test_jump_is_reported_as_gap():
+    detector = MessageGapDetector(min_missing=20)
+    detector.observe('g', 100)
+    assert detector.observe('g', 150) == 49
+    assert detector.gaps == 1
+
+
+def test_seeded_cursor_is_compared_with_first_message():
+    detector = MessageGapDetector(min_missing=20)
+    detector.seed('g', 100)
+    assert detector.observe('g', 200) == 99
+
+
+def test_older_message_does_not_move_last_id():
+    detector = MessageGapDetector(min_missing=20)
+    detector.observe('g', 100)
+    assert detector.observe('g', 90) == 0
+    assert detector.observe('g', 101) == 0
+
+
+def test_forget_drops_group():
+    detector = MessageGapDetector(min_missing=20)
+    detector.observe('g', 100)
+    detector.forget('g')
+    assert detector.observe('g', 500) == 0
@@ -0,0 +1,55 @@
+from typing import Dict, Set
+
+# Строка состояния аккаунта (pts/qts/date/seq) в сессии Telethon; остальные строки - pts каналов
+ACCOUNT_ENTRY = 0
+
+
+def saved_channel_ids(session) -> Set[int]:
+    """id каналов, pts которых сохранен в сессии Telethon.
+
+    Telethon сам записывает состояние обновлений в сессию (раз в минуту и
+    при отключении) и с catch_up=True загружает его при подключении:
+    пропущенные сообщения этих каналов догрузит разница обновлений.
+    """
+    states = dict(session.get_update_states())
+    if ACCOUNT_ENTRY not in states:
+        return set()
+    return set(states) - {ACCOUNT_ENTRY}
+
+
+class MessageGapDetector:
+    """Разрывы в последовательности id сообщений каналов.
+
+    В каналах и супергруппах id сообщений идут подряд, поэтому скачок id
+    между соседними полученными сообщениями означает пропущенные
+    обновления (например, Telegram ответил ChannelDifferenceTooLong и
+    Telethon перешел сразу к свежим сообщениям). Небольшие дыры оставляют
+    удаленные сообщения, поэтому разрывом считается скачок не меньше
+    min_missing id.
+    """
+
+    def __init__(self, min_missing: int = 20):
+        self.min_missing = max(1, min_missing)
+        self._last: Dict[str, int] = {}
+        self.gaps = 0
+
+    def seed(self, key: str, message_id: int):
+        """Последнее известное сообщение группы (курсор) до первого полученного"""
+        if message_id and message_id > self._last.get(key, 0):
+            self._last[key] = message_id
+
+    def observe(self, key: str, message_id: int) -> int:
+        """Учитывает полученное сообщение; возвращает число пропущенных id или 0"""
+        last = self._last.get(key)
+        if last is None or message_id > last:
+            self._last[key] = message_id
+        if last is None:
+            return 0
+        missing = message_id - last - 1
+        if missing < self.min_missing:
+            return 0
+        self.gaps += 1
+        return missing
+
+    def forget(self, key: str):
+        self._last.pop(key, None)